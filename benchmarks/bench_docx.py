@@ -0,0 +1,72 @@
+import os, sys
+if __name__ == "__main__" and __package__ is None:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
+import io
+import timeit
+import tracemalloc
+
+import docx
+
+from functions.file_processing import iter_docx_blocks
+
+
+# Прежний путь read_word: python-docx и только doc.paragraphs
+def legacy_extract(data: bytes) -> str:
+    doc = docx.Document(io.BytesIO(data))
+    return "\n".join(p.text for p in doc.paragraphs if p.text.strip())
+
+
+def streaming_extract(data: bytes) -> str:
+    return "\n".join(text for _, text in iter_docx_blocks(data))
+
+
+def build_sample(paragraphs: int, rows: int) -> bytes:
+    doc = docx.Document()
+    section = doc.sections[0]
+    section.header.paragraphs[0].text = "ООО «Пример», ИНН 7700000000"
+    section.footer.paragraphs[0].text = "Юридический адрес: г. Москва, ул. Примерная, д. 1"
+    for i in range(paragraphs):
+        doc.add_paragraph(f"{i + 1}. Работник обязуется выполнять трудовые обязанности добросовестно. " * 3)
+    table = doc.add_table(rows=rows, cols=3)
+    for i, row in enumerate(table.rows):
+        row.cells[0].text = f"Реквизит {i + 1}"
+        row.cells[1].text = "Значение"
+        row.cells[2].text = "Комментарий"
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def peak_memory(func, data: bytes) -> int:
+    tracemalloc.start()
+    func(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="python-docx vs streaming XML extraction for .docx")
+    parser.add_argument("files", nargs="*", help=".docx files (a synthetic contract is built if omitted)")
+    parser.add_argument("--paragraphs", type=int, default=2000)
+    parser.add_argument("--rows", type=int, default=300)
+    parser.add_argument("-n", "--number", type=int, default=5)
+    args = parser.parse_args()
+
+    samples = [(path, open(path, "rb").read()) for path in args.files]
+    if not samples:
+        samples = [(f"synthetic {args.paragraphs}p/{args.rows}r", build_sample(args.paragraphs, args.rows))]
+
+    for name, data in samples:
+        print(f"{name} ({len(data) / 1024:.0f} KB)")
+        for label, func in (("python-docx", legacy_extract), ("streaming", streaming_extract)):
+            seconds = min(timeit.repeat(lambda: func(data), number=1, repeat=args.number))
+            chars = len(func(data))
+            peak = peak_memory(func, data)
+            print(f"  {label:12} {seconds * 1000:8.1f} ms  peak {peak / 1024 / 1024:6.1f} MB  {chars} chars")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+import os, sys
+if __name__ == "__main__" and __package__ is None:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
+import random
+import re
+import timeit
+
+from functions.file_processing import ProfessionalOCRProcessor
+
+
+# Исходная реализация postprocess_text (до компиляции правил) — эталон для сравнения
+def legacy_postprocess_text(text: str) -> str:
+    if not text or not text.strip():
+        return ""
+
+    text = re.sub(r'\s+', ' ', text).strip()
+
+    corrections = [
+        (r'\bI\b', '1'),
+        (r'\|', 'l'),
+        (r'\[', 'l'),
+        (r'\]', 'l'),
+        (r'©', 'c'),
+        (r'®', 'r'),
+        (r'O(?=\d)', '0'),
+        (r'(\d)O', r'\g<1>0'),
+        (r'S(?=\d)', '5'),
+        (r'(\d)S', r'\g<1>5'),
+        (r'B(?=\d)', '8'),
+        (r'(\d)B', r'\g<1>8'),
+        (r'l(?=\d)', '1'),
+        (r'(\d)l', r'\g<1>1'),
+        (r'Z(?=\d)', '2'),
+        (r'(\d)Z', r'\g<1>2'),
+        (r'G(?=\d)', '6'),
+        (r'(\d)G', r'\g<1>6'),
+        (r'\bO\b', '0'),
+        (r',O', ',0'),
+        (r'\b[sS]\b', 'S'),
+        (r'l', 'I'),
+    ]
+
+    for pattern, replacement in corrections:
+        text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
+
+    text = re.sub(r'\~', '-', text)
+    text = re.sub(r'—', '-', text)
+    text = re.sub(r'’', "'", text)
+    text = re.sub(r'“|”', '"', text)
+
+    text = re.sub(r'(\w+)-\s*\n\s*(\w+)', r'\1\2', text)
+    text = re.sub(r'(\w+)-\s+(\w+)', r'\1\2', text)
+    text = re.sub(r'(\w+)-\s*\n', r'\1', text)
+
+    lines = []
+    for line in text.split('\n'):
+        line = line.strip()
+        if len(line) > 0:
+            if len(line) > 1 and line[0].islower():
+                line = line[0].upper() + line[1:]
+            lines.append(line)
+
+    cleaned_text = '\n'.join(lines)
+
+    cleaned_text = re.sub(r' +', ' ', cleaned_text)
+    cleaned_text = re.sub(r'\n\s*\n', '\n\n', cleaned_text)
+
+    common_corrections = {
+        'HsBC': 'HSBC',
+        'sW1A': 'SW1A',
+        '2O25l': '2025',
+    }
+    for wrong, right in common_corrections.items():
+        cleaned_text = re.sub(re.escape(wrong), right, cleaned_text)
+
+    return cleaned_text
+
+
+CONTRACT_SAMPLE = """EMPLOYMENT CONTRACT No. 2O25/l4B
+This agreement is made on l2 March 2O25 between HsBC Recruitment Ltd (Company No. O8l2345S),
+registered office: 8 Canada Square, London E14 5HQ, sW1A lAA, and the Employee named below.
+1. Position: Warehouse Operative | Salary: £24,5OO per annum, paid monthly~ Hours: 4O per week.
+2. Contact: hr@hsbc-recruit.co.uk, tel +44 (0)2O 7946 O958, www.hsbc-recruit.co.uk
+3. The Employee shall not be required to pay any “training fee” or ‘deposit’ — see clause I and s 4.
+Signed: ________ [Director]  © 2O25 ® All rights re-
+served. Pages: 1 of 3, ref ZG-7Z, ,O00, inter- national
+"""
+
+
+def make_corpus(size_kb: int, seed: int) -> str:
+    rng = random.Random(seed)
+    lines = CONTRACT_SAMPLE.splitlines()
+    out = []
+    total = 0
+    while total < size_kb * 1024:
+        line = rng.choice(lines)
+        out.append(line)
+        total += len(line) + 1
+    return "\n".join(out)
+
+
+def make_fuzz(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    alphabet = "OoSsBbLlIiZzGg0123456789 ,.-|[]©®~—’“”\n\tHWA-éſİı٣_"
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 80))) for _ in range(count)]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark OCR text post-processing")
+    parser.add_argument("--size-kb", type=int, default=64, help="size of the synthetic contract text")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    compiled = ProfessionalOCRProcessor.postprocess_text
+
+    samples = make_fuzz(20000, seed=1) + [CONTRACT_SAMPLE, make_corpus(16, seed=2)]
+    mismatches = [sample for sample in samples if compiled(sample) != legacy_postprocess_text(sample)]
+    if mismatches:
+        print(f"FAIL: {len(mismatches)} outputs differ from the legacy implementation, e.g. {mismatches[0]!r}")
+        return 1
+
+    text = make_corpus(args.size_kb, seed=3)
+    legacy_time = min(timeit.repeat(lambda: legacy_postprocess_text(text), number=1, repeat=args.repeat))
+    compiled_time = min(timeit.repeat(lambda: compiled(text), number=1, repeat=args.repeat))
+
+    print(f"text size:  {len(text) / 1024:.1f} KB, {len(samples)} equivalence samples OK")
+    print(f"legacy:     {legacy_time * 1000:.2f} ms")
+    print(f"compiled:   {compiled_time * 1000:.2f} ms")
+    print(f"speedup:    {legacy_time / compiled_time:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+import os, sys
+if __name__ == "__main__" and __package__ is None:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
+import subprocess
+from collections import defaultdict
+
+from config.settings import settings
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(module: str) -> dict:
+    # -X importtime пишет в stderr: "import time: self [us] | cumulative | imported package"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    packages = defaultdict(int)
+    total = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|")
+        # Время каждого модуля относим к его пакету верхнего уровня
+        packages[name.strip().split(".")[0]] += int(self_us)
+        if name.strip() == module and not name.startswith("  "):
+            total = int(cumulative)
+    return {'returncode': proc.returncode, 'error': proc.stderr if proc.returncode else '',
+            'total_ms': total / 1000, 'packages': packages}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Cold import time of the bot entry point")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=settings.STARTUP_IMPORT_BUDGET_MS)
+    args = parser.parse_args()
+
+    report = measure(args.module)
+    if report['returncode']:
+        print(report['error'].strip().splitlines()[-1])
+        return 2
+
+    for name, micros in sorted(report['packages'].items(), key=lambda x: x[1], reverse=True)[:args.top]:
+        print(f"{micros / 1000:9.1f} ms  {name}")
+    print(f"total:    {report['total_ms']:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    if report['total_ms'] > args.budget_ms:
+        print("FAIL: import time is over budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
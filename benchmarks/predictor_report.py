@@ -0,0 +1,54 @@
+import os, sys
+if __name__ == "__main__" and __package__ is None:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
+import json
+from collections import Counter
+
+from config.settings import settings
+
+
+def load_entries(path: str) -> list:
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return entries
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Hit rate of the OCR strategy predictor")
+    parser.add_argument("path", nargs="?", default=settings.OCR_PREDICTOR_TELEMETRY_FILE)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print(f"no telemetry at {args.path}")
+        return 1
+
+    entries = load_entries(args.path)
+    audited = [e for e in entries if e.get("audit")]
+    regular = [e for e in entries if not e.get("audit")]
+
+    print(f"jobs:              {len(entries)} ({len(audited)} audited with the full cascade)")
+    if audited:
+        hits = sum(1 for e in audited if e.get("hit"))
+        print(f"audit hit rate:    {hits / len(audited):.1%}  (prediction == best of the full cascade)")
+    if regular:
+        first_pass = sum(1 for e in regular if e.get("first_pass"))
+        passes = sum(e.get("passes", 0) for e in regular) / len(regular)
+        print(f"first-pass exits:  {first_pass / len(regular):.1%}")
+        print(f"OCR passes / job:  {passes:.2f}")
+
+    misses = Counter((e.get("predicted"), e.get("winner")) for e in audited if not e.get("hit"))
+    for (predicted, winner), count in misses.most_common(5):
+        print(f"miss: predicted {predicted}, full cascade picked {winner}: {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -17,7 +17,7 @@ os.makedirs(FILES_DIR, exist_ok=True)
 converter = FileConvertToText()
 FORMATS = {
     '.png', '.jpg', '.jpeg', '.tiff', '.bmp', '.webp', '.jfif',
-    '.docx', '.csv', '.pdf', '.xlsx', '.xls', '.txt' }
+    '.doc', '.docx', '.csv', '.pdf', '.xlsx', '.xls', '.txt' }
 
 MAX_SIZE_BYTES = 10 * 1024 * 1024
 
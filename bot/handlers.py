@@ -10,15 +10,14 @@ from telebot import types
 from pathlib import Path
 from bot.bot import *
 import aiosmtplib
+import mimetypes
 import datetime
-import aiofiles
+import asyncio
 import aiohttp
 import json
 import os
 from sqlalchemy import select, delete
 from database.connection import AsyncSessionLocal
-from PIL import Image
-import io
 
 
 # ----------------------------------commands----------------------------------
@@ -135,9 +134,9 @@ async def handle_help(message: types.Message) -> None:
             "4️⃣ Итог: ✅ Безопасно | ⚠️ Нужна проверка | 🚨 Рисковано\n\n"
 
             "📦 *Технические особенности:*\n"
-            "• OCR-распознавание для изображений (EasyOCR, OpenCV)\n"
+            "• OCR-распознавание для изображений (Tesseract, OpenCV)\n"
             "• Поддержка до 10 MB на файл\n"
-            "• Поддержка .pdf, .docx, .xls/.xlsx, .csv, .jpg/.jpeg/.png/.bmp/.tiff/.webp, .txt\n"
+            "• Поддержка .pdf, .doc/.docx, .xls/.xlsx, .csv, .jpg/.jpeg/.png/.bmp/.tiff/.webp, .txt\n"
             "• Хранение истории в PostgreSQL\n"
             "• Безопасное хранение данных пользователей\n\n"
 
@@ -177,9 +176,9 @@ async def handle_help(message: types.Message) -> None:
             "4️⃣ Натиҷа: ✅ Бехатар | ⚠️ Бо эҳтиёт | 🚨 Хатарнок\n\n"
 
             "📦 *Маълумоти техникӣ:*\n"
-            "• OCR барои тасвирҳо (EasyOCR, OpenCV)\n"
+            "• OCR барои тасвирҳо (Tesseract, OpenCV)\n"
             "• Андозаи максималии файл — 10 MB\n"
-            "• Форматҳои дастгиришаванда: .pdf, .docx, .xls/.xlsx, .csv, .jpg/.png/.bmp/.tiff/.webp, .txt\n"
+            "• Форматҳои дастгиришаванда: .pdf, .doc/.docx, .xls/.xlsx, .csv, .jpg/.png/.bmp/.tiff/.webp, .txt\n"
             "• Маълумоти корбар боэътимод нигоҳ дошта мешавад\n\n"
 
             "💬 *Маслиҳатҳо:*\n"
@@ -218,9 +217,9 @@ async def handle_help(message: types.Message) -> None:
             "4️⃣ Result: ✅ SAFE | ⚠️ WARNING | 🚨 RISKY\n\n"
 
             "📦 *Technical Info:*\n"
-            "• OCR for image files (EasyOCR, OpenCV)\n"
+            "• OCR for image files (Tesseract, OpenCV)\n"
             "• Max file size: 10 MB\n"
-            "• Supported formats: .pdf, .docx, .xls/.xlsx, .csv, .jpg/.jpeg/.png/.bmp/.tiff/.webp, .txt\n"
+            "• Supported formats: .pdf, .doc/.docx, .xls/.xlsx, .csv, .jpg/.jpeg/.png/.bmp/.tiff/.webp, .txt\n"
             "• Secure data handling — PostgreSQL backend\n\n"
 
             "💬 *Tips:*\n"
@@ -522,8 +521,15 @@ def get_cancel_keyboard() -> ReplyKeyboardMarkup:
     markup.add(types.KeyboardButton("❌ Отменить / Cancel"))
     return markup
 
-def cancel_check(user_id: str) -> None:
+def cancel_check(user_id: str, cancel_event: Optional[asyncio.Event] = None) -> None:
     if user_id in user_state and user_state[user_id].get('mode') == 'check_waiting':
+        # Завершение старой проверки не должно трогать новую /check, начатую за это время
+        if cancel_event is not None and user_state[user_id].get('cancel_event') is not cancel_event:
+            return
+        # Останавливает OCR этой проверки, если он ещё идёт
+        cancel_event = user_state[user_id].get('cancel_event')
+        if cancel_event is not None:
+            cancel_event.set()
         del user_state[user_id]
 
 def is_check_active(user_id: str) -> bool:
@@ -542,28 +548,25 @@ def is_check_active(user_id: str) -> bool:
     return True
 
 async def process_file(file: types.Document):
-    file_path = os.path.join(FILES_DIR, file.file_name)
     try:
         file_info = await bot.get_file(file.file_id)
         if file_info.file_size > MAX_SIZE_BYTES:
             return None, None, {"error": "File is too large (max 10 MB)"}
         file_data = await bot.download_file(file_info.file_path)
-        async with aiofiles.open(file_path, 'wb') as f:
-            await f.write(file_data)
     except Exception as e:
-        return None, file_path if os.path.exists(file_path) else None, {"error": f"Download/write error: {str(e)}"}
+        return None, None, {"error": f"Download error: {str(e)}"}
     
-    file_meta = await converter.get_file_format(file_path)  
+    file_meta = converter.get_buffer_format(file_data, file.file_name)  
     if isinstance(file_meta, dict) and file_meta.get("error"):
-        return None, file_path, file_meta
+        return None, None, file_meta
     
     ext = file_meta.get("extension")
     
-    text = await converter.convert_to_text(file_path)  
+    text = await converter.convert_to_text(file_data, file_name=file.file_name)  
     if isinstance(text, str) and text.startswith("Ошибка"):
-        return None, file_path, {"error": "Conversion failed"}
+        return None, None, {"error": "Conversion failed"}
     
-    return text, file_path, ext
+    return text, None, ext
 
 @bot.message_handler(commands=['check'])
 async def handle_check(message: types.Message):
@@ -603,7 +606,8 @@ async def handle_check(message: types.Message):
     user_state[user_id] = {
         'mode': 'check_waiting',
         'started_at': datetime.datetime.now(UTC),
-        'processing': False
+        'processing': False,
+        'cancel_event': asyncio.Event()
     }
 
     await bot.send_message(
@@ -641,7 +645,8 @@ async def handle_photo(message: types.Message):
         'tj': "⏳ Акс коркард мешавад (OCR)...",
         'en': "⏳ Processing image (OCR)..."
     }
-    await bot.send_message(message.chat.id, wait_texts.get(user_lang, wait_texts['en']), reply_markup=ReplyKeyboardRemove())
+    await bot.send_message(message.chat.id, wait_texts.get(user_lang, wait_texts['en']), reply_markup=get_cancel_keyboard())
+    cancel_event = user_state[user_id].get('cancel_event')
 
     file_id = message.photo[-1].file_id
     file = await bot.get_file(file_id)
@@ -655,25 +660,17 @@ async def handle_photo(message: types.Message):
 
     file_data = await bot.download_file(file.file_path)
 
-    png_path = os.path.join(FILES_DIR, f"{user_id}_temp_image.png")
-    try:
-        img = Image.open(io.BytesIO(file_data))
-        img = img.convert("RGB")  
-        img.save(png_path, "PNG")
-    except Exception as e:
-        await bot.send_message(message.chat.id, f"❌ Хатогӣ дар табдилдиҳӣ: {str(e)}")
-        cancel_check(user_id)
+    # Фото из Telegram — всегда JPEG: байты идут в OCR напрямую, без PNG и временных файлов
+    text = await converter.convert_to_text(file_data, cancel_event=cancel_event, file_name=f"{user_id}_photo.jpg")
+    # Отмена могла прийти, когда файл уже прочитан (docx, кэш OCR) — статус её не отражает
+    if (cancel_event is not None and cancel_event.is_set()) or (isinstance(text, dict) and text.get('status') == 'cancelled'):
         return
-
-    text = await converter.convert_to_text(png_path)
     if isinstance(text, str) and text.startswith("Ошибка"):
         await bot.send_message(message.chat.id, "❌ OCR нашуд. Матн аз акс хонда нашуд.")
-        if os.path.exists(png_path):
-            os.remove(png_path)
-        cancel_check(user_id)
+        cancel_check(user_id, cancel_event)
         return
 
-    await process_contract_text(message, text, file_path=png_path, file_type="png")
+    await process_contract_text(message, text, file_type="jpg")
 
 @bot.message_handler(content_types=['document'])
 async def handle_document(message: types.Message):
@@ -707,43 +704,33 @@ async def handle_document(message: types.Message):
         return
 
     user_state[user_id]['processing'] = True
-    await bot.send_message(message.chat.id, "⏳ Файл коркард мешавад...", reply_markup=ReplyKeyboardRemove())
-
-    file_info = await bot.get_file(message.document.file_id)
-    file_data = await bot.download_file(file_info.file_path)
-    temp_path = os.path.join(FILES_DIR, f"{user_id}_doc_temp{Path(file_name).suffix}")
-    async with aiofiles.open(temp_path, 'wb') as f:
-        await f.write(file_data)
-
-    final_path = temp_path
-    final_ext = "png" if is_image else Path(file_name).suffix.lower()
+    await bot.send_message(message.chat.id, "⏳ Файл коркард мешавад...", reply_markup=get_cancel_keyboard())
+    cancel_event = user_state[user_id].get('cancel_event')
 
-    if is_image:
-        try:
-            img = Image.open(temp_path)
-            final_path = os.path.join(FILES_DIR, f"{user_id}_converted.png")
-            img.convert("RGB").save(final_path, "PNG")
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-        except Exception as e:
-            await bot.send_message(message.chat.id, f"❌ Хатогӣ дар табдил: {e}")
-            cancel_check(user_id)
-            return
+    final_ext = Path(file_name).suffix.lower()
+    if is_image and final_ext not in FORMATS:
+        # Картинка без привычного расширения: расширение по MIME, декодирование — в OCR
+        final_ext = mimetypes.guess_extension(mime_type) or ".png"
 
-    if final_ext not in FORMATS and not is_image:
+    if final_ext not in FORMATS:
         await bot.send_message(message.chat.id, "❌ Формат дастгирӣ намешавад.")
         cancel_check(user_id)
         return
 
-    text = await converter.convert_to_text(final_path)
+    file_info = await bot.get_file(message.document.file_id)
+    file_data = await bot.download_file(file_info.file_path)
+
+    text = await converter.convert_to_text(
+        file_data, cancel_event=cancel_event, file_name=f"{Path(file_name).stem or user_id}{final_ext}"
+    )
+    if (cancel_event is not None and cancel_event.is_set()) or (isinstance(text, dict) and text.get('status') == 'cancelled'):
+        return
     if isinstance(text, str) and text.startswith("Ошибка"):
         await bot.send_message(message.chat.id, "❌ Матн хонда нашуд.")
-        if os.path.exists(final_path):
-            os.remove(final_path)
-        cancel_check(user_id)
+        cancel_check(user_id, cancel_event)
         return
 
-    await process_contract_text(message, text, file_path=final_path, file_type=final_ext)
+    await process_contract_text(message, text, file_type=final_ext)
 
 @bot.message_handler(func=lambda m: isinstance(m.text, str) and m.text.strip() != '' and not m.text.startswith('/')
                   and is_check_active(str(m.chat.id)),content_types=['text'])
@@ -809,9 +796,14 @@ async def process_contract_text(
 ) -> None:
     user_id = str(message.chat.id)
     user_lang = await get_lang(user_id) or 'ru'
+    cancel_event = (user_state.get(user_id) or {}).get('cancel_event')
+    if cancel_event is not None and cancel_event.is_set():
+        return
 
     ai = AsyncAiProcessing(text)
     ai_result = await ai.get_answer_json_dict()
+    if cancel_event is not None and cancel_event.is_set():
+        return
     if not ai_result:
         error_texts = {
             'ru': "❌ Не удалось извлечь данные из текста. Попробуйте другой формат или уточните текст.",
@@ -824,11 +816,13 @@ async def process_contract_text(
                 os.remove(file_path)
             except Exception:
                 pass
-        cancel_check(user_id)
+        cancel_check(user_id, cancel_event)
         return
 
     async with AsyncCheckAnalysisContract(ai_result) as analysis:
         detailed_report = await analysis.get_detailed_report()
+    if cancel_event is not None and cancel_event.is_set():
+        return
 
     total_score = detailed_report.get("total_score", 0)
     status = detailed_report.get("status", "unknown")
@@ -957,7 +951,7 @@ async def process_contract_text(
         except Exception:
             pass
 
-    cancel_check(user_id)
+    cancel_check(user_id, cancel_event)
 # ----------------------------------------------------------------------------
 
 
@@ -23,6 +23,73 @@ class Settings:
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
     COMPANIES_HOUSE_API = os.getenv("COMPANIES_HOUSE_API")
 
+    OCR_ENGINE = os.getenv("OCR_ENGINE", "auto").lower()
+    OCR_WORKERS = int(os.getenv("OCR_WORKERS", os.cpu_count() or 1))
+    OCR_MAX_INFLIGHT = int(os.getenv("OCR_MAX_INFLIGHT", OCR_WORKERS))
+    OCR_MAX_QUEUE = int(os.getenv("OCR_MAX_QUEUE", 32))
+    OCR_TIMEOUT_SECONDS = float(os.getenv("OCR_TIMEOUT_SECONDS", 180))
+    OCR_TILE_WORKERS = int(os.getenv("OCR_TILE_WORKERS", 1 if OCR_WORKERS > 1 else min(4, os.cpu_count() or 1)))
+    OCR_TILE_MIN_PIXELS = int(os.getenv("OCR_TILE_MIN_PIXELS", 6_000_000))
+    OCR_TILE_MAX_HEIGHT = int(os.getenv("OCR_TILE_MAX_HEIGHT", 2000))
+    OCR_TILE_OVERLAP = int(os.getenv("OCR_TILE_OVERLAP", 48))
+    OCR_EARLY_EXIT = os.getenv("OCR_EARLY_EXIT", "1").lower() in ("1", "true", "yes")
+    OCR_EARLY_EXIT_CONFIDENCE = float(os.getenv("OCR_EARLY_EXIT_CONFIDENCE", 0.85))
+    OCR_EARLY_EXIT_QUALITY = float(os.getenv("OCR_EARLY_EXIT_QUALITY", 0.6))
+    OCR_STRATEGY_ORDER = os.getenv(
+        "OCR_STRATEGY_ORDER",
+        "simple:original,advanced:original,simple:inverted,simple:high_contrast,"
+        "advanced:inverted,advanced:high_contrast"
+    )
+
+    OCR_PREDICTOR = os.getenv("OCR_PREDICTOR", "1").lower() in ("1", "true", "yes")
+    OCR_PREDICTOR_AUDIT_RATE = float(os.getenv("OCR_PREDICTOR_AUDIT_RATE", 0.05))
+    OCR_PREDICTOR_TELEMETRY_FILE = os.getenv(
+        "OCR_PREDICTOR_TELEMETRY_FILE", os.path.join("logs", "ocr_predictor_telemetry.jsonl")
+    )
+
+    OCR_ORIENTATION = os.getenv("OCR_ORIENTATION", "1").lower() in ("1", "true", "yes")
+    OCR_OSD_MIN_CONFIDENCE = float(os.getenv("OCR_OSD_MIN_CONFIDENCE", 2.0))
+    OCR_DESKEW = os.getenv("OCR_DESKEW", "1").lower() in ("1", "true", "yes")
+    OCR_DESKEW_MAX_ANGLE = float(os.getenv("OCR_DESKEW_MAX_ANGLE", 10))
+    OCR_DESKEW_MIN_ANGLE = float(os.getenv("OCR_DESKEW_MIN_ANGLE", 0.3))
+    OCR_SCRIPT_DETECTION = os.getenv("OCR_SCRIPT_DETECTION", "1").lower() in ("1", "true", "yes")
+    OCR_SCRIPT_MIN_CONFIDENCE = float(os.getenv("OCR_SCRIPT_MIN_CONFIDENCE", 1.0))
+    OCR_SCRIPT_LANGUAGES = os.getenv("OCR_SCRIPT_LANGUAGES", "Latin:eng")
+
+    OCR_TARGET_TEXT_HEIGHT = float(os.getenv("OCR_TARGET_TEXT_HEIGHT", 24))
+    OCR_MAX_PIXELS = int(os.getenv("OCR_MAX_PIXELS", 12_000_000))
+    OCR_MIN_SCALE = float(os.getenv("OCR_MIN_SCALE", 0.25))
+    OCR_MAX_SCALE = float(os.getenv("OCR_MAX_SCALE", 3.0))
+
+    OCR_CACHE_ENABLED = os.getenv("OCR_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+    OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", os.path.join("tmp", "ocr_cache"))
+    OCR_CACHE_MEMORY_ITEMS = int(os.getenv("OCR_CACHE_MEMORY_ITEMS", 256))
+    OCR_CACHE_MAX_MB = float(os.getenv("OCR_CACHE_MAX_MB", 200))
+
+    PDF_OCR_DPI = int(os.getenv("PDF_OCR_DPI", 200))
+    PDF_OCR_MAX_PAGES = int(os.getenv("PDF_OCR_MAX_PAGES", 10))
+    PDF_OCR_MIN_TEXT_CHARS = int(os.getenv("PDF_OCR_MIN_TEXT_CHARS", 25))
+    PDF_TEXT_MAX_PAGES = int(os.getenv("PDF_TEXT_MAX_PAGES", 30))
+    PDF_TEXT_MAX_CHARS = int(os.getenv("PDF_TEXT_MAX_CHARS", 60000))
+    PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 100))
+    PDF_PARALLEL_CHUNK_PAGES = int(os.getenv("PDF_PARALLEL_CHUNK_PAGES", 25))
+    TABLE_MAX_ROWS = int(os.getenv("TABLE_MAX_ROWS", 5000))
+    TABLE_MAX_COLUMNS = int(os.getenv("TABLE_MAX_COLUMNS", 50))
+    TABLE_CSV_CHUNK_ROWS = int(os.getenv("TABLE_CSV_CHUNK_ROWS", 1000))
+
+    OFFICE_SANDBOX_WORKERS = int(os.getenv("OFFICE_SANDBOX_WORKERS", 2))
+    OFFICE_SANDBOX_TIMEOUT_SECONDS = float(os.getenv("OFFICE_SANDBOX_TIMEOUT_SECONDS", 60))
+    OFFICE_SANDBOX_MEMORY_MB = int(os.getenv("OFFICE_SANDBOX_MEMORY_MB", 2048))
+    OFFICE_SANDBOX_CPU_SECONDS = int(os.getenv("OFFICE_SANDBOX_CPU_SECONDS", 60))
+    OFFICE_SANDBOX_MIN_INFLATED_MB = int(os.getenv("OFFICE_SANDBOX_MIN_INFLATED_MB", 50))
+
+    OCR_SCRATCH_ROOT = os.getenv("OCR_SCRATCH_ROOT")
+    OCR_DEBUG_IMAGES = os.getenv("OCR_DEBUG_IMAGES", "0").lower() in ("1", "true", "yes")
+    OCR_DEBUG_SAMPLE_RATE = float(os.getenv("OCR_DEBUG_SAMPLE_RATE", 1.0))
+    OCR_DEBUG_DIR = os.getenv("OCR_DEBUG_DIR", os.path.join("tmp", "debug"))
+
+    STARTUP_IMPORT_BUDGET_MS = float(os.getenv("STARTUP_IMPORT_BUDGET_MS", 1500))
+
 
 settings = Settings()
 
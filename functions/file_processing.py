@@ -1,26 +1,258 @@
-from typing import Optional, Dict, List, Any,Tuple
-from asyncio import Semaphore
-from docx import Document
+from typing import Optional, Dict, List, Any,Tuple, Callable, AsyncIterator, Iterator, Union
+from collections import OrderedDict, Counter, deque
+from config.settings import settings
+from datetime import datetime
 import concurrent.futures
+import multiprocessing
+import importlib.util
 from pathlib import Path
-from PIL import Image, ImageEnhance
-import pandas as pd
+from PIL import Image
+import lazy_loader as lazy
 import numpy as np
 import mimetypes
 import aiofiles
-import easyocr
+import hashlib
+import inspect
+import functools
+import itertools
+import math
+import threading
+import tempfile
+import random
+import uuid
+import json
+import sys
+import zipfile
+import xml.etree.ElementTree as ET
+import io
 import logging
 import asyncio
 import shutil 
-import cv2
 import os
 import re
-import docx   
-import pytesseract
-import fitz
-
 
+# Тяжёлые библиотеки грузятся при первом обращении, а не при старте бота
+cv2 = lazy.load("cv2")
+pd = lazy.load("pandas")
+fitz = lazy.load("fitz")
+openpyxl = lazy.load("openpyxl")
+pytesseract = lazy.load("pytesseract")
+tesserocr = lazy.load("tesserocr") if importlib.util.find_spec("tesserocr") else None
+
+
+
+
+
+# --- OCR text post-processing rules (compiled once) ---
+_OCR_STANDALONE_I_RE = re.compile(r'\bI\b', re.IGNORECASE)
+_OCR_SYMBOL_REPLACEMENTS = (('|', 'l'), ('[', 'l'), (']', 'l'), ('©', 'c'), ('®', 'r'))
+# Буквы рядом с цифрами: O/0, S/5, B/8, l/1, Z/2, G/6 — в этом порядке приоритета
+_OCR_DIGIT_LETTERS = (('O', '0'), ('S', '5'), ('B', '8'), ('L', '1'), ('Z', '2'), ('G', '6'))
+_OCR_DIGIT_RANKS = {letter: rank for rank, (letter, _) in enumerate(_OCR_DIGIT_LETTERS)}
+_OCR_DIGIT_RUN_RE = re.compile(r'(?<=\d)[OSBLZG]+|[OSBLZG]+(?=\d)', re.IGNORECASE)
+_OCR_STANDALONE_OS_RE = re.compile(r'\b[OS]\b', re.IGNORECASE)
+_OCR_FINAL_REPLACEMENTS = (
+    ('l', 'I'), ('L', 'I'), (',O', ',0'), (',o', ',0'),
+    ('~', '-'), ('—', '-'), ('’', "'"), ('“', '"'), ('”', '"')
+)
+_OCR_HYPHEN_NEWLINE_JOIN_RE = re.compile(r'(\w+)-\s*\n\s*(\w+)')
+_OCR_HYPHEN_SPACE_JOIN_RE = re.compile(r'\b(\w+)-\s+(\w+)')
+_OCR_HYPHEN_NEWLINE_RE = re.compile(r'(\w+)-\s*\n')
+_OCR_MULTISPACE_RE = re.compile(r' +')
+_OCR_BLANK_LINES_RE = re.compile(r'\n\s*\n')
+_OCR_COMMON_CORRECTIONS = (
+    ('HsBC', 'HSBC'),
+    ('sW1A', 'SW1A'),
+    ('2O25l', '2025'),
+)
+
+
+@functools.lru_cache(maxsize=4096)
+def _convert_digit_run(run: str, left_digit: bool, right_digit: bool) -> str:
+    # Эквивалент последовательных проходов X(?=\d) / (\d)X по буквам O,S,B,l,Z,G:
+    # буква становится цифрой, если сосед — цифра или буква, ставшая цифрой на более раннем проходе
+    ranks = [_OCR_DIGIT_RANKS[ch.upper()] for ch in run]
+    last = len(run) - 1
+    converted = [False] * len(run)
+    for rank in range(len(_OCR_DIGIT_LETTERS)):
+        before = converted[:]
+        for k, letter_rank in enumerate(ranks):
+            if letter_rank == rank and (
+                (left_digit if k == 0 else before[k - 1])
+                or (right_digit if k == last else before[k + 1])
+            ):
+                converted[k] = True
+    return ''.join(
+        _OCR_DIGIT_LETTERS[ranks[k]][1] if converted[k] else ch
+        for k, ch in enumerate(run)
+    )
+
+
+def _replace_digit_run(match: "re.Match") -> str:
+    text, run = match.string, match.group()
+    start, end = match.span()
+    return _convert_digit_run(
+        run,
+        start > 0 and text[start - 1].isdecimal(),
+        end < len(text) and text[end].isdecimal()
+    )
+
+
+def _replace_standalone_os(match: "re.Match") -> str:
+    return '0' if match.group() in 'Oo' else 'S'
+
+
+class ImagePipeline:
+    def __init__(
+        self,
+        image: np.ndarray,
+        name: str = "image",
+        job_id: Optional[str] = None,
+        capture_debug: bool = False
+    ):
+        self.image = image
+        self.name = name
+        self.job_id = job_id or uuid.uuid4().hex[:12]
+        self.capture_debug = capture_debug
+        self.rotation = 0
+        self.skew_angle = 0.0
+        self.osd: Optional[Dict[str, Any]] = None
+        self.scale: Optional[float] = None
+        self._cache: Dict[Tuple[Any, ...], np.ndarray] = {}
+
+    def replace_image(self, image: np.ndarray) -> None:
+        self.image = image
+        self.scale = None
+        self._cache.clear()
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.image.shape[:2]
+
+    @property
+    def gray(self) -> np.ndarray:
+        key = ('gray',)
+        if key not in self._cache:
+            if len(self.image.shape) == 3:
+                self._cache[key] = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+            else:
+                self._cache[key] = self.image
+        return self._cache[key]
+
+    def resized(self, scale: float) -> np.ndarray:
+        if scale == 1.0:
+            return self.gray
+        key = ('resized', scale)
+        if key not in self._cache:
+            height, width = self.gray.shape
+            new_size = (int(width * scale), int(height * scale))
+            interpolation = cv2.INTER_CUBIC if scale > 1.0 else cv2.INTER_AREA
+            self._cache[key] = cv2.resize(self.gray, new_size, interpolation=interpolation)
+        return self._cache[key]
+
+    def clahe(self, scale: float, clip_limit: float = 4.0, tile_grid_size: Tuple[int, int] = (12, 12)) -> np.ndarray:
+        key = ('clahe', scale, clip_limit, tile_grid_size)
+        if key not in self._cache:
+            clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=tile_grid_size)
+            self._cache[key] = clahe.apply(self.resized(scale))
+        return self._cache[key]
+
+
+class TesseractEngine:
+    def __init__(self, psm: int = 3, oem: int = 3, tessdata_path: Optional[str] = None):
+        self.psm = psm
+        self.oem = oem
+        self.tessdata_path = tessdata_path or os.getenv("TESSDATA_PREFIX")
+        # PyTessBaseAPI не потокобезопасен: по экземпляру на поток и набор языков
+        self._local = threading.local()
+
+    def _get_api(self, languages: str, psm: Optional[int] = None) -> Any:
+        apis = getattr(self._local, 'apis', None)
+        if apis is None:
+            apis = self._local.apis = {}
+        psm = self.psm if psm is None else psm
+        api = apis.get((languages, psm))
+        if api is None:
+            kwargs = {'lang': languages, 'psm': psm, 'oem': self.oem}
+            if self.tessdata_path:
+                kwargs['path'] = self.tessdata_path
+            api = tesserocr.PyTessBaseAPI(**kwargs)
+            apis[(languages, psm)] = api
+        return api
+
+    def detect_orientation_script(self, image: np.ndarray) -> Optional[Dict[str, Any]]:
+        api = self._get_api('osd', tesserocr.PSM.OSD_ONLY)
+        api.SetImage(Image.fromarray(image))
+        osd = api.DetectOrientationScript()
+        if not osd:
+            return None
+        return {
+            'orient_deg': osd['orient_deg'],
+            'orient_conf': osd['orient_conf'],
+            'script': osd['script_name'],
+            'script_conf': osd['script_conf'],
+        }
 
+    def recognize(self, image: np.ndarray, languages: str) -> List[Dict[str, Any]]:
+        api = self._get_api(languages)
+        if len(image.shape) == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        api.SetImage(Image.fromarray(image))
+        api.Recognize()
+
+        words = []
+        iterator = api.GetIterator()
+        if iterator is None:
+            return words
+
+        ril = tesserocr.RIL
+        block = par = line = 0
+        for word in tesserocr.iterate_level(iterator, ril.WORD):
+            if word.IsAtBeginningOf(ril.BLOCK):
+                block += 1
+            if word.IsAtBeginningOf(ril.PARA):
+                par += 1
+            if word.IsAtBeginningOf(ril.TEXTLINE):
+                line += 1
+            text = word.GetUTF8Text(ril.WORD)
+            if not text or not text.strip():
+                continue
+            x1, y1, x2, y2 = word.BoundingBox(ril.WORD)
+            words.append({
+                'text': text,
+                'conf': word.Confidence(ril.WORD),
+                'left': x1, 'top': y1, 'width': x2 - x1, 'height': y2 - y1,
+                'block': block, 'par': par, 'line': line,
+            })
+        return words
+
+    def close(self) -> None:
+        for api in getattr(self._local, 'apis', {}).values():
+            api.End()
+        self._local.apis = {}
+
+
+_TESSERACT_ENGINE: Optional[TesseractEngine] = None
+_TESSERACT_VERSION: Optional[str] = None
+
+
+def get_tesseract_engine() -> Optional[TesseractEngine]:
+    global _TESSERACT_ENGINE
+    if settings.OCR_ENGINE == "pytesseract" or tesserocr is None:
+        return None
+    if _TESSERACT_ENGINE is None:
+        _TESSERACT_ENGINE = TesseractEngine()
+    return _TESSERACT_ENGINE
+
+
+def get_tesseract_version() -> str:
+    global _TESSERACT_VERSION
+    if _TESSERACT_VERSION is None:
+        if tesserocr is not None:
+            _TESSERACT_VERSION = tesserocr.tesseract_version().splitlines()[0]
+        else:
+            _TESSERACT_VERSION = str(pytesseract.get_tesseract_version())
+    return _TESSERACT_VERSION
 
 
 class ProfessionalOCRProcessor:
@@ -33,27 +265,80 @@ class ProfessionalOCRProcessor:
         min_confidence: float = 0.6,
         gpu: bool = False,
         model_storage_directory: str = None,
-        download_enabled: bool = True
+        download_enabled: bool = True,
+        early_exit: Optional[bool] = None,
+        early_exit_confidence: Optional[float] = None,
+        early_exit_quality: Optional[float] = None,
+        strategy_order: Optional[List[str]] = None,
+        predictor: Optional[bool] = None,
+        script_detection: Optional[bool] = None
     ):
         self.languages = "+".join(languages)
         self.min_confidence = min_confidence
+        self.early_exit = settings.OCR_EARLY_EXIT if early_exit is None else early_exit
+        self.early_exit_confidence = (
+            settings.OCR_EARLY_EXIT_CONFIDENCE if early_exit_confidence is None else early_exit_confidence
+        )
+        self.early_exit_quality = settings.OCR_EARLY_EXIT_QUALITY if early_exit_quality is None else early_exit_quality
+        self.strategy_order = self.parse_strategy_order(strategy_order or settings.OCR_STRATEGY_ORDER)
+        self.predictor_enabled = settings.OCR_PREDICTOR if predictor is None else predictor
+        self.predictor_audit_rate = settings.OCR_PREDICTOR_AUDIT_RATE
+        self.predictor_telemetry_file = settings.OCR_PREDICTOR_TELEMETRY_FILE
+        self.script_detection = settings.OCR_SCRIPT_DETECTION if script_detection is None else script_detection
+        self.script_languages = self.parse_script_languages(settings.OCR_SCRIPT_LANGUAGES)
+        self.worker_config = {
+            'languages': list(languages),
+            'min_confidence': min_confidence,
+            'early_exit': self.early_exit,
+            'early_exit_confidence': self.early_exit_confidence,
+            'early_exit_quality': self.early_exit_quality,
+            'strategy_order': [f"{m}:{v}" for m, v in self.strategy_order],
+            'predictor': self.predictor_enabled,
+            'script_detection': self.script_detection,
+        }
         self.supported_formats = {'.png', '.jpg', '.jpeg', '.tiff', '.bmp', '.webp', '.jfif'}
         
         self.tesseract_config = f'--oem 3 --psm 3'
+        self.worker_config_key = json.dumps(
+            {**self.worker_config, 'tesseract_config': self.tesseract_config}, sort_keys=True
+        )
         
+        self.debug_images = settings.OCR_DEBUG_IMAGES
+        self.debug_sample_rate = settings.OCR_DEBUG_SAMPLE_RATE
+        self.debug_dir = settings.OCR_DEBUG_DIR
+
         self._setup_logging()
         
         os.makedirs(self.LOG_DIR, exist_ok=True)
-        os.makedirs("tmp/processed", exist_ok=True)
-        os.makedirs("tmp/debug", exist_ok=True)
+        if self.debug_images:
+            os.makedirs(self.debug_dir, exist_ok=True)
         
         self.logger.info(f"ProfessionalOCRProcessor инициализирован с языками: {self.languages}")
+        self.engine = get_tesseract_engine()
+        self.tile_workers = settings.OCR_TILE_WORKERS
+        self.tile_min_pixels = settings.OCR_TILE_MIN_PIXELS
+        self.tile_max_height = settings.OCR_TILE_MAX_HEIGHT
+        self.tile_overlap = settings.OCR_TILE_OVERLAP
+        self._tile_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
         try:
-            pytesseract.get_tesseract_version()
-            self.logger.info(f"Tesseract version: {pytesseract.get_tesseract_version()}")
+            self.logger.info(
+                f"Tesseract version: {get_tesseract_version()} "
+                f"({'tesserocr' if self.engine is not None else 'pytesseract'})"
+            )
         except pytesseract.TesseractNotFoundError:
             self.logger.error("❌ Tesseract насб нашудааст ё дар PATH нест. Лутфан, пеш аз идома додан Tesseract-ро насб кунед.")
 
+    @staticmethod
+    def parse_strategy_order(order: Any) -> List[Tuple[str, str]]:
+        if isinstance(order, str):
+            order = order.split(',')
+        strategies = []
+        for item in order:
+            method, _, variant = item.strip().partition(':')
+            if method:
+                strategies.append((method, variant or 'original'))
+        return strategies
+
     def _setup_logging(self):
         self.logger = logging.getLogger("ProfessionalOCRProcessor")
         self.logger.setLevel(logging.INFO)
@@ -71,103 +356,86 @@ class ProfessionalOCRProcessor:
         self.logger.addHandler(file_handler)
         self.logger.addHandler(console_handler)
 
-    def cleanup_tmp(self):
-        for tmp_dir in ["tmp/processed", "tmp/debug"]:
-            if os.path.exists(tmp_dir):
-                try:
-                    shutil.rmtree(tmp_dir)
-                    self.logger.info(f"Папка пок карда шуд: {tmp_dir}")
-                except Exception as e:
-                    self.logger.warning(f"Хатогӣ ҳангоми пок кардани {tmp_dir}: {e}")
-
-    def __del__(self):
-        try:
-            self.cleanup_tmp()
-        except:
-            pass
-
-    def validate_image(self, image_path: str) -> Tuple[bool, str]:
+    def build_pipeline(self, image_path: str) -> Optional[ImagePipeline]:
         try:
             if not os.path.exists(image_path):
-                return False, f"Файл не существует: {image_path}"
-                
+                self.logger.error(f"Файл не существует: {image_path}")
+                return None
+
             file_ext = Path(image_path).suffix.lower()
             if file_ext not in self.supported_formats:
-                return False, f"Неподдерживаемый формат: {file_ext}"
-            
-            file_size = os.path.getsize(image_path) / (1024 * 1024) 
-            if file_size > 100: 
-                return False, f"Файл слишком большой: {file_size:.1f}MB"
-            
-            with Image.open(image_path) as img:
-                img.verify()
-                if img.size[0] < 10 or img.size[1] < 10:
-                    return False, "Изображение слишком маленькое"
-                if img.size[0] > 10000 or img.size[1] > 10000:
-                    return False, "Изображение слишком большое"
-            
-            self.logger.info(f"Файл валиден: {image_path} ({file_size:.2f}MB)")
-            return True, "OK"
-            
+                self.logger.error(f"Неподдерживаемый формат: {file_ext}")
+                return None
+
+            with open(image_path, 'rb') as f:
+                data = f.read()
+            return self.build_pipeline_from_bytes(data, Path(image_path).name)
+
         except Exception as e:
-            error_msg = f"Ошибка валидации изображения {image_path}: {str(e)}"
-            self.logger.error(error_msg)
-            return False, error_msg
+            self.logger.error(f"Ошибка валидации изображения {image_path}: {str(e)}")
+            return None
 
-    def load_image(self, path: str) -> Optional[np.ndarray]:
+    def build_pipeline_from_bytes(self, data: bytes, name: str = "image") -> Optional[ImagePipeline]:
         try:
-            with open(path, 'rb') as f:
-                data = np.frombuffer(f.read(), dtype=np.uint8)
-            img = cv2.imdecode(data, cv2.IMREAD_COLOR)
+            file_size = len(data) / (1024 * 1024)
+            if file_size > 100:
+                self.logger.error(f"Файл слишком большой: {file_size:.1f}MB")
+                return None
+
+            # Только заголовок: размеры проверяются до полного декодирования
+            with Image.open(io.BytesIO(data)) as img:
+                width, height = img.size
+            if width < 10 or height < 10:
+                self.logger.error("Изображение слишком маленькое")
+                return None
+            if width > 10000 or height > 10000:
+                self.logger.error("Изображение слишком большое")
+                return None
+
+            img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
             if img is None:
-                raise ValueError("Не удалось декодировать изображение")
-            return img
+                # Форматы, которых нет в OpenCV, декодирует PIL
+                with Image.open(io.BytesIO(data)) as pil_image:
+                    img = cv2.cvtColor(np.asarray(pil_image.convert("RGB")), cv2.COLOR_RGB2BGR)
+
+            self.logger.info(f"Файл валиден: {name} ({file_size:.2f}MB)")
+            return ImagePipeline(img, name, capture_debug=self.should_capture_debug())
+
         except Exception as e:
-            self.logger.error(f"Ошибка загрузки изображения {path}: {e}")
+            self.logger.error(f"Ошибка валидации изображения {name}: {str(e)}")
             return None
 
+    def should_capture_debug(self) -> bool:
+        return self.debug_images and random.random() < self.debug_sample_rate
+
     def save_debug_image(self, image: np.ndarray, prefix: str, filename: str):
+        if not self.debug_images:
+            return None
         try:
-            debug_path = f"tmp/debug/{prefix}_{Path(filename).stem}.png"
+            os.makedirs(self.debug_dir, exist_ok=True)
+            debug_path = os.path.join(self.debug_dir, f"{prefix}_{Path(filename).stem}.png")
             cv2.imwrite(debug_path, image)
             return debug_path
         except Exception as e:
             self.logger.warning(f"Не удалось сохранить отладочное изображение: {e}")
             return None
 
-    def advanced_preprocessing(self, image_path: str) -> Optional[np.ndarray]:
+    def advanced_preprocessing(self, image_path: str, pipeline: Optional[ImagePipeline] = None) -> Optional[np.ndarray]:
         try:
-            is_valid, message = self.validate_image(image_path)
-            if not is_valid:
-                self.logger.error(message)
+            if pipeline is None:
+                pipeline = self.build_pipeline(image_path)
+            if pipeline is None:
                 return None
 
-            img = self.load_image(image_path)
-            if img is None:
-                return None
-
-            original_size = img.shape[:2]
+            original_size = pipeline.shape
             self.logger.info(f"Оригинальный размер: {original_size[1]}x{original_size[0]}")
 
-            if len(img.shape) == 3:
-                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            else:
-                gray = img
-
-            max_dimension = max(original_size)
-            scale_factor = 1.0
-            if max_dimension < 1000:
-                scale_factor = 2.0
-            elif max_dimension < 3000:
-                scale_factor = 1.5
-            
+            scale_factor = self.normalization_scale(pipeline)
             if scale_factor != 1.0:
                 new_size = (int(original_size[1] * scale_factor), int(original_size[0] * scale_factor))
-                gray = cv2.resize(gray, new_size, interpolation=cv2.INTER_LANCZOS4) 
                 self.logger.info(f"Масштабированный размер: {new_size[0]}x{new_size[1]}")
 
-            clahe = cv2.createCLAHE(clipLimit=4.0, tileGridSize=(12, 12))
-            enhanced = clahe.apply(gray)
+            enhanced = pipeline.clahe(scale_factor)
 
             gaussian = cv2.GaussianBlur(enhanced, (0, 0), 5.0)
             sharpened = cv2.addWeighted(enhanced, 2.0, gaussian, -1.0, 0)
@@ -189,7 +457,8 @@ class ProfessionalOCRProcessor:
             cleaned = cv2.morphologyEx(cleaned, cv2.MORPH_CLOSE, kernel_close)
             cleaned = cv2.medianBlur(cleaned, 3)
 
-            self.save_debug_image(cleaned, "advanced", Path(image_path).name)
+            if pipeline.capture_debug:
+                self.save_debug_image(cleaned, "advanced", f"{pipeline.job_id}_{pipeline.name}")
 
             return cleaned
 
@@ -197,30 +466,20 @@ class ProfessionalOCRProcessor:
             self.logger.exception(f"Ошибка в advanced_preprocessing: {e}")
             return None
 
-    def medium_preprocessing(self, image_path: str) -> Optional[np.ndarray]:
-        return self.advanced_preprocessing(image_path)
+    def medium_preprocessing(self, image_path: str, pipeline: Optional[ImagePipeline] = None) -> Optional[np.ndarray]:
+        return self.advanced_preprocessing(image_path, pipeline)
 
-    def simple_preprocessing(self, image_path: str) -> Optional[np.ndarray]:
+    def simple_preprocessing(self, image_path: str, pipeline: Optional[ImagePipeline] = None) -> Optional[np.ndarray]:
         try:
-            is_valid, message = self.validate_image(image_path)
-            if not is_valid:
-                return None
-
-            img = self.load_image(image_path)
-            if img is None:
+            if pipeline is None:
+                pipeline = self.build_pipeline(image_path)
+            if pipeline is None:
                 return None
 
-            if len(img.shape) == 3:
-                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            else:
-                gray = img
-
-            height, width = gray.shape
-            if max(height, width) < 1000:
-                new_size = (int(width * 1.5), int(height * 1.5))
-                gray = cv2.resize(gray, new_size, interpolation=cv2.INTER_LANCZOS4)
+            gray = pipeline.resized(self.normalization_scale(pipeline))
 
-            self.save_debug_image(gray, "simple", Path(image_path).name)
+            if pipeline.capture_debug:
+                self.save_debug_image(gray, "simple", f"{pipeline.job_id}_{pipeline.name}")
 
             return gray
 
@@ -228,21 +487,116 @@ class ProfessionalOCRProcessor:
             self.logger.exception(f"Ошибка в simple_preprocessing: {e}")
             return None
 
-    def create_image_variants(self, base_image: np.ndarray) -> List[Tuple[str, np.ndarray]]:
-        variants = [("original", base_image)]
-        
+    def estimate_text_height(self, gray: np.ndarray) -> Optional[float]:
+        height, width = gray.shape[:2]
+        scale = min(1.0, 1500 / max(height, width))
+        small = gray
+        if scale < 1.0:
+            small = cv2.resize(gray, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+        _, binary = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        if cv2.countNonZero(binary) > binary.size / 2:
+            binary = cv2.bitwise_not(binary)
+
+        count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        if count <= 1:
+            return None
+        widths = stats[1:, cv2.CC_STAT_WIDTH]
+        heights = stats[1:, cv2.CC_STAT_HEIGHT]
+        # Похожие на буквы компоненты: не точки/шум и не линии/рамки
+        letters = (heights >= 3) & (heights <= small.shape[0] * 0.1) & (widths <= heights * 5) & (heights <= widths * 10)
+        if np.count_nonzero(letters) < 20:
+            return None
+        return float(np.median(heights[letters])) / scale
+
+    def enforce_pixel_budget(self, pipeline: ImagePipeline) -> None:
+        height, width = pipeline.shape
+        if height * width <= settings.OCR_MAX_PIXELS:
+            return
+        # Поворот, выравнивание и фолбэк без препроцессинга тоже работают на ограниченном размере
+        scale = (settings.OCR_MAX_PIXELS / (height * width)) ** 0.5
+        new_size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        pipeline.replace_image(cv2.resize(pipeline.image, new_size, interpolation=cv2.INTER_AREA))
+        self.logger.info(f"Изображение {width}x{height} уменьшено до {new_size[0]}x{new_size[1]}")
+
+    def normalization_scale(self, pipeline: ImagePipeline) -> float:
+        if pipeline.scale is not None:
+            return pipeline.scale
+
+        height, width = pipeline.shape
+        text_height = self.estimate_text_height(pipeline.gray)
+        if text_height:
+            scale = settings.OCR_TARGET_TEXT_HEIGHT / text_height
+        else:
+            max_dimension = max(height, width)
+            scale = 2.0 if max_dimension < 1000 else 1.5 if max_dimension < 3000 else 1.0
+        scale = min(max(scale, settings.OCR_MIN_SCALE), settings.OCR_MAX_SCALE)
+        # Масштабы близкие к 1 не стоят ресайза
+        scale = 1.0 if abs(scale - 1.0) < 0.1 else round(scale, 2)
+
+        # Жёсткий бюджет пикселей: CLAHE, размытие и порог работают на ограниченном размере
+        if height * width * scale * scale > settings.OCR_MAX_PIXELS:
+            scale = math.floor((settings.OCR_MAX_PIXELS / (height * width)) ** 0.5 * 100) / 100
+
+        pipeline.scale = scale
+        self.logger.info(
+            f"Нормализация: высота текста={text_height or 0:.1f}px, масштаб={scale}"
+        )
+        return scale
+
+    def analyze_image(self, pipeline: ImagePipeline) -> Dict[str, Any]:
+        gray = pipeline.gray
+        height, width = gray.shape[:2]
+        scale = min(1.0, 1000 / max(height, width))
+        small = gray
+        if scale < 1.0:
+            small = cv2.resize(gray, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+        low, high = np.percentile(small, (5, 95))
+        _, binary = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        # Текста на странице меньше, чем фона: если светлых пикселей меньше половины, текст светлый
+        inverted = cv2.countNonZero(binary) < binary.size * 0.45
+        background_mask = binary == (0 if inverted else 255)
+        background = small[background_mask]
+        noise = cv2.absdiff(small, cv2.medianBlur(small, 3))[background_mask]
+
+        return {
+            'contrast': round(float(high - low) / 255, 3),
+            'background_brightness': round(float(np.median(background)) / 255 if background.size else 0.0, 3),
+            'noise': round(float(noise.mean()) if noise.size else 0.0, 2),
+            'blur_variance': round(float(cv2.Laplacian(small, cv2.CV_64F).var()), 1),
+            'inverted': bool(inverted),
+        }
+
+    def predict_strategy(self, stats: Dict[str, Any]) -> Tuple[str, str]:
+        variant = "inverted" if stats['inverted'] else "original"
+        # Шум, слабый контраст и размытость лучше всего вытягивает CLAHE + резкость + адаптивный порог
+        degraded = stats['noise'] > 6 or stats['contrast'] < 0.35 or stats['blur_variance'] < 100
+        if degraded and stats['noise'] <= 6 and not stats['inverted'] and stats['background_brightness'] < 0.5:
+            # Тёмный, но чистый снимок: достаточно поднять яркость
+            return "simple", "high_contrast"
+        return ("advanced" if degraded else "simple"), variant
+
+    def record_prediction(self, entry: Dict[str, Any]) -> None:
         try:
-            inverted = cv2.bitwise_not(base_image)
-            variants.append(("inverted", inverted))
-            
-            if base_image.dtype == np.uint8:
-                high_contrast = cv2.convertScaleAbs(base_image, alpha=2.0, beta=0) 
-                variants.append(("high_contrast", high_contrast))
-                
-        except Exception as e:
-            self.logger.warning(f"Не удалось создать некоторые варианты изображения: {e}")
-            
-        return variants
+            os.makedirs(os.path.dirname(self.predictor_telemetry_file) or ".", exist_ok=True)
+            with open(self.predictor_telemetry_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except OSError as e:
+            self.logger.warning(f"Не удалось записать телеметрию предсказателя: {e}")
+
+    def make_image_variant(
+        self, base_image: np.ndarray, variant_name: str, out: Optional[np.ndarray] = None
+    ) -> Optional[np.ndarray]:
+        if variant_name == "original":
+            return base_image
+        # Вариант пишется в переданный буфер, если он подходит по размеру
+        if out is None or out.shape != base_image.shape or out.dtype != base_image.dtype:
+            out = np.empty_like(base_image)
+        if variant_name == "inverted":
+            return cv2.bitwise_not(base_image, dst=out)
+        if variant_name == "high_contrast" and base_image.dtype == np.uint8:
+            return cv2.convertScaleAbs(base_image, dst=out, alpha=2.0, beta=0)
+        return None
 
     def extract_specific_data(self, text: str) -> Dict[str, List[str]]:
         data = {
@@ -279,52 +633,32 @@ class ProfessionalOCRProcessor:
         
         return data
 
-    def postprocess_text(self, text: str) -> str:
+    @staticmethod
+    def postprocess_text(text: str) -> str:
         if not text or not text.strip():
             return ""
 
-        # 1. Тозакунии фазо
-        text = re.sub(r'\s+', ' ', text).strip()
-        
-        # 2. Ислоҳоти маъмулии OCR (expanded for common confusions: O/0, I/1/l, S/5, B/8, etc.)
-        corrections = [
-            (r'\bI\b', '1'),  # I to 1 in numbers
-            (r'\|', 'l'), 
-            (r'\[', 'l'), 
-            (r'\]', 'l'), 
-            (r'©', 'c'), 
-            (r'®', 'r'), 
-            (r'O(?=\d)', '0'),  # O to 0 before digits
-            (r'(\d)O', r'\g<1>0'),  # O to 0 after digits
-            (r'S(?=\d)', '5'),  # S to 5 in numbers
-            (r'(\d)S', r'\g<1>5'),  # S to 5 after digits
-            (r'B(?=\d)', '8'),  # B to 8 in numbers
-            (r'(\d)B', r'\g<1>8'),  # B to 8 after digits
-            (r'l(?=\d)', '1'),  # l to 1 in numbers
-            (r'(\d)l', r'\g<1>1'),  # l to 1 after digits
-            (r'Z(?=\d)', '2'),  # Z to 2
-            (r'(\d)Z', r'\g<1>2'),
-            (r'G(?=\d)', '6'),  # G to 6
-            (r'(\d)G', r'\g<1>6'),
-            (r'\bO\b', '0'),    # Standalone O to 0
-            (r',O', ',0'),      # Comma O to 0 in numbers like 52,O00
-            (r'\b[sS]\b', 'S'), # Fix case for single letters
-            (r'l', 'I'),        # l to I in some contexts
-        ]
-        
-        for pattern, replacement in corrections:
-            text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)  # Added IGNORECASE
+        # 1. Тозакунии фазо (str.split() делит по тем же символам, что и \s)
+        text = ' '.join(text.split())
 
-        # Additional fixes for symbols and punctuation
-        text = re.sub(r'\~', '-', text)  # Tilde to dash
-        text = re.sub(r'—', '-', text)   # Em dash to hyphen
-        text = re.sub(r'’', "'", text)   # Smart quotes to straight
-        text = re.sub(r'“|”', '"', text) 
+        # 2. Ислоҳоти маъмулии OCR (O/0, I/1/l, S/5, B/8, Z/2, G/6); порядок правил значим
+        text = _OCR_STANDALONE_I_RE.sub('1', text)
+        for wrong, right in _OCR_SYMBOL_REPLACEMENTS:
+            if wrong in text:
+                text = text.replace(wrong, right)
+        text = _OCR_DIGIT_RUN_RE.sub(_replace_digit_run, text)
+        text = _OCR_STANDALONE_OS_RE.sub(_replace_standalone_os, text)
+        for wrong, right in _OCR_FINAL_REPLACEMENTS:
+            if wrong in text:
+                text = text.replace(wrong, right)
 
         # 3. Пайваст кардани хатҳои тақсимшуда
-        text = re.sub(r'(\w+)-\s*\n\s*(\w+)', r'\1\2', text)
-        text = re.sub(r'(\w+)-\s+(\w+)', r'\1\2', text)
-        text = re.sub(r'(\w+)-\s*\n', r'\1', text)
+        if '\n' in text:
+            text = _OCR_HYPHEN_NEWLINE_JOIN_RE.sub(r'\1\2', text)
+        if '- ' in text:
+            text = _OCR_HYPHEN_SPACE_JOIN_RE.sub(r'\1\2', text)
+        if '\n' in text:
+            text = _OCR_HYPHEN_NEWLINE_RE.sub(r'\1', text)
 
         # 4. Капитализатсия ва тозакунии охирин
         lines = []
@@ -334,24 +668,45 @@ class ProfessionalOCRProcessor:
                 if len(line) > 1 and line[0].islower():
                     line = line[0].upper() + line[1:]
                 lines.append(line)
-                
+
         cleaned_text = '\n'.join(lines)
-        
-        cleaned_text = re.sub(r' +', ' ', cleaned_text)
-        cleaned_text = re.sub(r'\n\s*\n', '\n\n', cleaned_text)
+
+        if '  ' in cleaned_text:
+            cleaned_text = _OCR_MULTISPACE_RE.sub(' ', cleaned_text)
+        if '\n' in cleaned_text:
+            cleaned_text = _OCR_BLANK_LINES_RE.sub('\n\n', cleaned_text)
 
         # 5. Simple spell correction for common words (no external lib, manual dict)
-        common_corrections = {
-            'HsBC': 'HSBC',
-            'sW1A': 'SW1A',
-            '2O25l': '2025',
-            # Add more if needed based on domain
-        }
-        for wrong, right in common_corrections.items():
-            cleaned_text = re.sub(re.escape(wrong), right, cleaned_text)
+        for wrong, right in _OCR_COMMON_CORRECTIONS:
+            if wrong in cleaned_text:
+                cleaned_text = cleaned_text.replace(wrong, right)
 
         return cleaned_text
 
+    @classmethod
+    def postprocess_layout(cls, text: str) -> str:
+        if not text or not text.strip():
+            return ""
+        # postprocess_text сводит пробелы в одну строку, поэтому вызывается построчно;
+        # перенос слова через конец строки склеивается заранее
+        if '\n' in text:
+            text = _OCR_HYPHEN_NEWLINE_JOIN_RE.sub(r'\1\2', text)
+        paragraphs = []
+        for paragraph in _OCR_BLANK_LINES_RE.split(text):
+            lines = []
+            for raw_line in paragraph.split('\n'):
+                line = cls.postprocess_text(raw_line)
+                if not line:
+                    continue
+                first = raw_line.lstrip()[:1]
+                # Заглавная буква нужна только в начале абзаца, а не каждой строки
+                if lines and first.islower() and line[0] == first.upper():
+                    line = first + line[1:]
+                lines.append(line)
+            if lines:
+                paragraphs.append('\n'.join(lines))
+        return '\n\n'.join(paragraphs)
+
     def calculate_text_quality(self, text: str, avg_confidence: float) -> Dict[str, float]:
         if not text:
             return {'overall': 0.0, 'structure': 0.0, 'readability': 0.0, 'confidence': 0.0}
@@ -378,30 +733,346 @@ class ProfessionalOCRProcessor:
             'confidence': avg_confidence
         }
     
-    def perform_tesseract_ocr(self, image: np.ndarray) -> Tuple[str, float]:
+    def recognize_words(self, image: np.ndarray, languages: Optional[str] = None) -> List[Dict[str, Any]]:
+        languages = languages or self.languages
+        height, width = image.shape[:2]
+        if self.tile_workers > 1 and height * width >= self.tile_min_pixels:
+            tiles = self.plan_tiles(image)
+            if len(tiles) > 1:
+                self.logger.info(f"Тайловый OCR: {len(tiles)} тайлов, потоков={self.tile_workers}")
+                return self.recognize_tiled(image, tiles, languages)
+        return self.recognize_region(image, languages)
+
+    def recognize_region(self, image: np.ndarray, languages: Optional[str] = None) -> List[Dict[str, Any]]:
+        languages = languages or self.languages
+        if self.engine is not None:
+            try:
+                return self.engine.recognize(image, languages)
+            except Exception as e:
+                self.logger.warning(f"tesserocr не сработал, переходим на pytesseract: {e}")
+
+        data = pytesseract.image_to_data(
+            image,
+            lang=languages,
+            config=self.tesseract_config,
+            output_type=pytesseract.Output.DICT
+        )
+        words = []
+        for i, text in enumerate(data['text']):
+            conf = float(data['conf'][i])
+            if conf == -1 or not text or not text.strip():
+                continue
+            words.append({
+                'text': text,
+                'conf': conf,
+                'left': data['left'][i], 'top': data['top'][i],
+                'width': data['width'][i], 'height': data['height'][i],
+                'block': data['block_num'][i], 'par': data['par_num'][i], 'line': data['line_num'][i],
+            })
+        return words
+
+    def detect_orientation(self, gray: np.ndarray) -> Optional[Dict[str, Any]]:
+        height, width = gray.shape[:2]
+        scale = min(1.0, 2000 / max(height, width))
+        small = gray
+        if scale < 1.0:
+            small = cv2.resize(gray, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
         try:
-            data = pytesseract.image_to_data(
-                image, 
-                lang=self.languages, 
-                config=self.tesseract_config, 
-                output_type=pytesseract.Output.DATAFRAME
+            if self.engine is not None:
+                return self.engine.detect_orientation_script(small)
+            data = pytesseract.image_to_osd(small, output_type=pytesseract.Output.DICT)
+            return {
+                'orient_deg': int(data['orientation']),
+                'orient_conf': float(data['orientation_conf']),
+                'script': data['script'],
+                'script_conf': float(data['script_conf']),
+            }
+        except Exception as e:
+            # Мало текста или нет osd.traineddata — ориентация остаётся как есть
+            self.logger.info(f"OSD недоступен: {e}")
+            return None
+
+    def estimate_skew(self, gray: np.ndarray) -> float:
+        height, width = gray.shape[:2]
+        scale = min(1.0, 800 / max(height, width))
+        small = gray
+        if scale < 1.0:
+            small = cv2.resize(gray, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+        _, binary = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        if cv2.countNonZero(binary) > binary.size / 2:
+            binary = cv2.bitwise_not(binary)
+        if cv2.countNonZero(binary) == 0:
+            return 0.0
+
+        center = (small.shape[1] / 2, small.shape[0] / 2)
+
+        def profile_score(angle: float) -> float:
+            matrix = cv2.getRotationMatrix2D(center, angle, 1.0)
+            rotated = cv2.warpAffine(binary, matrix, (small.shape[1], small.shape[0]), flags=cv2.INTER_NEAREST)
+            profile = rotated.sum(axis=1, dtype=np.float64)
+            return float(np.sum(np.diff(profile) ** 2))
+
+        # Грубый, затем точный поиск угла с самым резким профилем строк
+        max_angle = settings.OCR_DESKEW_MAX_ANGLE
+        best = max(np.arange(-max_angle, max_angle + 0.01, 1.0), key=profile_score)
+        fine = np.arange(max(best - 1.0, -max_angle), min(best + 1.0, max_angle) + 0.01, 0.25)
+        best = max(fine, key=profile_score)
+        # Без явного выигрыша у нуля (пустое или почти пустое изображение) поворот не нужен
+        if profile_score(best) <= profile_score(0.0):
+            return 0.0
+        return float(best)
+
+    @staticmethod
+    def rotate_bound(image: np.ndarray, angle: float) -> np.ndarray:
+        height, width = image.shape[:2]
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+        cos, sin = abs(matrix[0, 0]), abs(matrix[0, 1])
+        new_width, new_height = int(height * sin + width * cos), int(height * cos + width * sin)
+        matrix[0, 2] += new_width / 2 - width / 2
+        matrix[1, 2] += new_height / 2 - height / 2
+        return cv2.warpAffine(
+            image, matrix, (new_width, new_height),
+            flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE
+        )
+
+    @staticmethod
+    def parse_script_languages(value: str) -> Dict[str, str]:
+        mapping = {}
+        for item in value.split(','):
+            script, _, language = item.strip().partition(':')
+            if script.strip() and language.strip():
+                mapping[script.strip()] = language.strip()
+        return mapping
+
+    def languages_for_script(self, osd: Optional[Dict[str, Any]]) -> str:
+        if not osd or osd.get('script_conf', 0.0) < settings.OCR_SCRIPT_MIN_CONFIDENCE:
+            return self.languages
+        # OSD называет только преобладающий алфавит и смешение не видит, поэтому сужаются лишь алфавиты
+        # из OCR_SCRIPT_LANGUAGES; кириллические договоры с латинскими email и названиями остаются на eng+rus
+        language = self.script_languages.get(osd.get('script'))
+        if language is None or language not in self.languages.split('+'):
+            return self.languages
+        return language
+
+    def select_languages(self, pipeline: ImagePipeline) -> str:
+        if not self.script_detection or '+' not in self.languages:
+            return self.languages
+        if pipeline.osd is None and not settings.OCR_ORIENTATION:
+            pipeline.osd = self.detect_orientation(pipeline.gray)
+        languages = self.languages_for_script(pipeline.osd)
+        if pipeline.osd:
+            self.logger.info(
+                f"Алфавит: {pipeline.osd.get('script')} ({pipeline.osd.get('script_conf', 0.0):.2f}), языки={languages}"
             )
-            
-            data = data[data.conf != -1]
-            data = data.dropna(subset=['text'])
-            
-            reliable_data = data[data.conf / 100 >= self.min_confidence]
-            
-            if reliable_data.empty:
-                full_text = pytesseract.image_to_string(image, lang=self.languages, config=self.tesseract_config)
-                avg_confidence = data['conf'].mean() / 100 if not data.empty else 0.0
-                return full_text, avg_confidence
+        return languages
 
-            text = ' '.join(reliable_data['text'].astype(str))
-            
-            avg_confidence = reliable_data['conf'].mean() / 100
-            
-            return text, avg_confidence
+    def correct_orientation(self, pipeline: ImagePipeline) -> None:
+        try:
+            if settings.OCR_ORIENTATION:
+                pipeline.osd = self.detect_orientation(pipeline.gray)
+                if pipeline.osd and pipeline.osd['orient_conf'] >= settings.OCR_OSD_MIN_CONFIDENCE:
+                    # orient_deg — поворот страницы по часовой стрелке; возвращаем обратно
+                    rotate_code = {
+                        90: cv2.ROTATE_90_COUNTERCLOCKWISE,
+                        180: cv2.ROTATE_180,
+                        270: cv2.ROTATE_90_CLOCKWISE,
+                    }.get(pipeline.osd['orient_deg'])
+                    if rotate_code is not None:
+                        pipeline.replace_image(cv2.rotate(pipeline.image, rotate_code))
+                        pipeline.rotation = pipeline.osd['orient_deg']
+                        self.logger.info(f"Исправлена ориентация: {pipeline.rotation}°")
+
+            if settings.OCR_DESKEW:
+                angle = self.estimate_skew(pipeline.gray)
+                if abs(angle) >= settings.OCR_DESKEW_MIN_ANGLE:
+                    pipeline.replace_image(self.rotate_bound(pipeline.image, angle))
+                    pipeline.skew_angle = angle
+                    self.logger.info(f"Исправлен наклон: {angle:.2f}°")
+        except Exception as e:
+            self.logger.warning(f"Не удалось определить ориентацию/наклон: {e}")
+
+    def detect_text_blocks(self, image: np.ndarray) -> List[Tuple[int, int, int, int]]:
+        gray = image if len(image.shape) == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        height, width = gray.shape
+        scale = min(1.0, 1500 / max(height, width))
+        small = gray
+        if scale < 1.0:
+            small = cv2.resize(gray, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+        _, binary = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        if cv2.countNonZero(binary) > binary.size / 2:
+            binary = cv2.bitwise_not(binary)
+
+        kernel = cv2.getStructuringElement(
+            cv2.MORPH_RECT, (max(3, small.shape[1] // 80), max(3, small.shape[0] // 100))
+        )
+        merged = cv2.dilate(binary, kernel, iterations=2)
+        contours, _ = cv2.findContours(merged, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        blocks = []
+        min_area = 0.001 * small.shape[0] * small.shape[1]
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            if w * h < min_area:
+                continue
+            blocks.append((int(x / scale), int(y / scale), int(w / scale), int(h / scale)))
+        return self.merge_overlapping_blocks(blocks)
+
+    @staticmethod
+    def merge_overlapping_blocks(blocks: List[Tuple[int, int, int, int]]) -> List[Tuple[int, int, int, int]]:
+        boxes = [[x, y, x + w, y + h] for x, y, w, h in blocks]
+        merged = True
+        while merged:
+            merged = False
+            for i in range(len(boxes)):
+                for j in range(i + 1, len(boxes)):
+                    a, b = boxes[i], boxes[j]
+                    if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                        boxes[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                        del boxes[j]
+                        merged = True
+                        break
+                if merged:
+                    break
+        return [(x0, y0, x1 - x0, y1 - y0) for x0, y0, x1, y1 in boxes]
+
+    @staticmethod
+    def order_blocks(blocks: List[Tuple[int, int, int, int]], page_width: int) -> List[List[Tuple[int, int, int, int]]]:
+        # Порядок чтения: полосы между блоками во всю ширину, внутри полосы — колонки слева направо
+        groups = []
+        band = []
+
+        def flush_band():
+            columns = []
+            for block in sorted(band, key=lambda b: b[0]):
+                x, _, w, _ = block
+                for column in columns:
+                    overlap = min(column['x1'], x + w) - max(column['x0'], x)
+                    if overlap > 0.5 * min(w, column['x1'] - column['x0']):
+                        column['blocks'].append(block)
+                        column['x0'] = min(column['x0'], x)
+                        column['x1'] = max(column['x1'], x + w)
+                        break
+                else:
+                    columns.append({'x0': x, 'x1': x + w, 'blocks': [block]})
+            for column in sorted(columns, key=lambda c: c['x0']):
+                groups.append(sorted(column['blocks'], key=lambda b: b[1]))
+            band.clear()
+
+        for block in sorted(blocks, key=lambda b: b[1]):
+            if block[2] >= 0.6 * page_width:
+                flush_band()
+                groups.append([block])
+            else:
+                band.append(block)
+        flush_band()
+        return groups
+
+    def plan_tiles(self, image: np.ndarray) -> List[Dict[str, Tuple[int, int, int, int]]]:
+        height, width = image.shape[:2]
+        blocks = self.detect_text_blocks(image)
+        if not blocks:
+            return []
+
+        boxes = []
+        for group in self.order_blocks(blocks, width):
+            current = None
+            for x, y, w, h in group:
+                box = (x, y, x + w, y + h)
+                if current is not None and max(current[3], box[3]) - current[1] <= self.tile_max_height:
+                    current = (min(current[0], box[0]), current[1], max(current[2], box[2]), max(current[3], box[3]))
+                else:
+                    if current is not None:
+                        boxes.append(current)
+                    current = box
+            boxes.append(current)
+
+        tiles = []
+        overlap = self.tile_overlap
+        for x0, y0, x1, y1 in boxes:
+            for top in range(y0, y1, self.tile_max_height):
+                bottom = min(top + self.tile_max_height, y1)
+                tiles.append({
+                    'core': (x0, top, x1, bottom),
+                    'box': (
+                        max(0, x0 - overlap), max(0, top - overlap),
+                        min(width, x1 + overlap), min(height, bottom + overlap)
+                    ),
+                })
+        return tiles
+
+    def _recognize_tile(
+        self, image: np.ndarray, index: int, tile: Dict[str, Tuple[int, int, int, int]], languages: str
+    ) -> List[Dict[str, Any]]:
+        bx0, by0, bx1, by1 = tile['box']
+        cx0, cy0, cx1, cy1 = tile['core']
+        crop = np.ascontiguousarray(image[by0:by1, bx0:bx1])
+
+        if self.script_detection and '+' in languages and len(crop.shape) == 2:
+            # Страница со смешанным алфавитом: отдельные блоки часто на одном языке
+            languages = self.languages_for_script(self.detect_orientation(crop))
+
+        words = []
+        for word in self.recognize_region(crop, languages):
+            left, top = word['left'] + bx0, word['top'] + by0
+            center_x, center_y = left + word['width'] / 2, top + word['height'] / 2
+            # Слова из зоны перекрытия принадлежат соседнему тайлу
+            if not (cx0 <= center_x < cx1 and cy0 <= center_y < cy1):
+                continue
+            words.append({**word, 'left': left, 'top': top, 'block': (index, word['block'])})
+        return words
+
+    def recognize_tiled(
+        self, image: np.ndarray, tiles: List[Dict[str, Tuple[int, int, int, int]]], languages: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        languages = languages or self.languages
+        if self.tile_workers <= 1:
+            # Без отдельного потока: в воркере пула остаётся один экземпляр PyTessBaseAPI на набор языков
+            words = []
+            for index, tile in enumerate(tiles):
+                words.extend(self._recognize_tile(image, index, tile, languages))
+            return words
+        if self._tile_executor is None:
+            self._tile_executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.tile_workers)
+        futures = [
+            self._tile_executor.submit(self._recognize_tile, image, index, tile, languages)
+            for index, tile in enumerate(tiles)
+        ]
+        words = []
+        for future in futures:
+            words.extend(future.result())
+        return words
+
+    @staticmethod
+    def words_to_text(words: List[Dict[str, Any]]) -> str:
+        parts = []
+        prev_line = prev_par = None
+        for word in words:
+            par_key = (word['block'], word['par'])
+            line_key = par_key + (word['line'],)
+            if parts:
+                if par_key != prev_par:
+                    parts.append('\n\n')
+                elif line_key != prev_line:
+                    parts.append('\n')
+                else:
+                    parts.append(' ')
+            parts.append(word['text'])
+            prev_line, prev_par = line_key, par_key
+        return ''.join(parts)
+
+    def perform_tesseract_ocr(self, image: np.ndarray, languages: Optional[str] = None) -> Tuple[str, float]:
+        try:
+            words = self.recognize_words(image, languages)
+            reliable = [word for word in words if word['conf'] / 100 >= self.min_confidence]
+
+            # Оба варианта текста строятся из одного распознавания
+            if not reliable:
+                avg_confidence = sum(word['conf'] for word in words) / len(words) / 100 if words else 0.0
+                return self.words_to_text(words), avg_confidence
+
+            avg_confidence = sum(word['conf'] for word in reliable) / len(reliable) / 100
+            return self.words_to_text(reliable), avg_confidence
             
         except pytesseract.TesseractNotFoundError:
             self.logger.error("❌ Tesseract насб нашудааст ё дар PATH нест.")
@@ -410,146 +1081,266 @@ class ProfessionalOCRProcessor:
             self.logger.error(f"Ошибка Tesseract OCR: {e}")
             return "", 0.0
 
+    @staticmethod
+    def result_score(result: Dict[str, Any]) -> float:
+        return result['quality_scores']['overall'] * result['confidence']
+
+    def is_good_enough(self, result: Dict[str, Any]) -> bool:
+        return (
+            result['confidence'] >= self.early_exit_confidence
+            and result['quality_scores']['overall'] >= self.early_exit_quality
+        )
+
     def extract_text_from_results(self, text: str, confidence: float) -> Tuple[str, float]:
         return text, confidence 
 
     def perform_ocr_with_fallback(self, file_path: str) -> Dict[str, Any]:
         self.logger.info(f"Начало OCR обработки: {file_path}")
-        
-        all_results = []
-        preprocessing_methods = [
-            ("simple", self.simple_preprocessing),
-            ("advanced", self.advanced_preprocessing),  # Removed medium as it's duplicate
-        ]
+        return self.perform_ocr_on_pipeline(self.build_pipeline(file_path), file_path)
+
+    def perform_ocr_on_bytes(self, data: bytes, name: str = "image") -> Dict[str, Any]:
+        self.logger.info(f"Начало OCR обработки: {name}")
+        return self.perform_ocr_on_pipeline(self.build_pipeline_from_bytes(data, name), name)
+
+    def perform_ocr_on_image(self, image: np.ndarray, name: str = "image") -> Dict[str, Any]:
+        self.logger.info(f"Начало OCR обработки изображения: {name}")
+        pipeline = ImagePipeline(image, name, capture_debug=self.should_capture_debug())
+        return self.perform_ocr_on_pipeline(pipeline, name)
+
+    def perform_ocr_on_pipeline(self, pipeline: Optional[ImagePipeline], source_name: str) -> Dict[str, Any]:
+        best_result: Optional[Dict[str, Any]] = None
+        successful_attempts = 0
+        preprocessing_methods = {
+            "simple": self.simple_preprocessing,
+            "advanced": self.advanced_preprocessing,
+        }
+        base_images: Dict[str, Optional[np.ndarray]] = {}
+        variant_buffer: Optional[np.ndarray] = None
+        strategy_order = self.strategy_order
+        early_exit = self.early_exit
+        image_stats = None
+        predicted = None
+        audit = False
+        passes = 0
+        exited_early = False
+        languages = self.languages
+
+        if pipeline is not None:
+            self.enforce_pixel_budget(pipeline)
+            self.correct_orientation(pipeline)
+            languages = self.select_languages(pipeline)
+
+            if self.predictor_enabled:
+                try:
+                    image_stats = self.analyze_image(pipeline)
+                    predicted = self.predict_strategy(image_stats)
+                    strategy_order = [predicted] + [s for s in strategy_order if s != predicted]
+                    # Часть изображений проходит весь каскад, чтобы мерить точность предсказания
+                    audit = random.random() < self.predictor_audit_rate
+                    early_exit = early_exit and not audit
+                    self.logger.info(f"Предсказанная стратегия: {predicted[0]}:{predicted[1]} {image_stats}")
+                except Exception as e:
+                    self.logger.warning(f"Не удалось проанализировать изображение: {e}")
 
-        try:
-            for method_name, preprocess_func in preprocessing_methods:
+        remaining = Counter(method_name for method_name, _ in strategy_order)
+        for method_name, variant_name in strategy_order:
+            preprocess_func = preprocessing_methods.get(method_name)
+            if preprocess_func is None:
+                self.logger.warning(f"Неизвестный метод препроцессинга: {method_name}")
+                continue
+
+            if pipeline is None:
+                break
+
+            if method_name not in base_images:
                 try:
                     self.logger.info(f"Пробуем метод препроцессинга: {method_name}")
-                    processed_image = preprocess_func(file_path)
-                    
-                    if processed_image is None:
-                        continue
-                        
-                    image_variants = self.create_image_variants(processed_image)
-                    
-                    for variant_name, variant_image in image_variants:
-                        try:
-                            raw_text, avg_confidence = self.perform_tesseract_ocr(variant_image)
-                            
-                            if raw_text and avg_confidence >= self.min_confidence:
-                                cleaned_text = self.postprocess_text(raw_text)
-                                quality_scores = self.calculate_text_quality(cleaned_text, avg_confidence)
-                                specific_data = self.extract_specific_data(cleaned_text)
-                                
-                                result_data = {
-                                    'text': cleaned_text,
-                                    'raw_text': raw_text,
-                                    'confidence': avg_confidence,
-                                    'quality_scores': quality_scores,
-                                    'preprocessing_method': method_name,
-                                    'image_variant': variant_name,
-                                    'word_count': len(cleaned_text.split()),
-                                    'character_count': len(cleaned_text),
-                                    'specific_data': specific_data,
-                                }
-                                
-                                all_results.append(result_data)
-                                self.logger.info(
-                                    f"Найден текст ({method_name}, {variant_name}): "
-                                    f" ({avg_confidence:.3f})"
-                                )
-                                
-                        except Exception as e:
-                            self.logger.warning(f"Ошибка при обработке варианта {variant_name}: {e}")
-                            continue
-                            
+                    base_images[method_name] = preprocess_func(source_name, pipeline)
                 except Exception as e:
                     self.logger.exception(f"Ошибка в методе {method_name}: {e}")
-                    continue
+                    base_images[method_name] = None
+
+            base_image = base_images[method_name]
+            remaining[method_name] -= 1
+            if not remaining[method_name]:
+                # Последний вариант этого метода: базовое изображение больше не нужно
+                base_images[method_name] = None
+            if base_image is None:
+                continue
 
-            if not all_results:
-                self.logger.info("Пробуем фолбэк: обработка без препроцессинга")
-                try:
-                    original_image = self.load_image(file_path)
-                    if original_image is not None:
-                        raw_text, avg_confidence = self.perform_tesseract_ocr(original_image)
-                        if raw_text and avg_confidence > 0.1:
-                            cleaned_text = self.postprocess_text(raw_text)
-                            quality_scores = self.calculate_text_quality(cleaned_text, avg_confidence)
-                            specific_data = self.extract_specific_data(cleaned_text)
-                            
-                            all_results.append({
-                                'text': cleaned_text,
-                                'raw_text': raw_text,
-                                'confidence': avg_confidence,
-                                'quality_scores': quality_scores,
-                                'preprocessing_method': 'fallback',
-                                'image_variant': 'original',
-                                'word_count': len(cleaned_text.split()),
-                                'character_count': len(cleaned_text),
-                                'specific_data': specific_data
-                            })
-                except Exception as e:
-                    self.logger.error(f"Фолбэк метод не сработал: {e}")
+            try:
+                # Варианты создаются по одному в общий буфер, а не все сразу
+                variant_image = self.make_image_variant(base_image, variant_name, variant_buffer)
+            except Exception as e:
+                self.logger.warning(f"Не удалось создать вариант изображения {variant_name}: {e}")
+                continue
+            if variant_image is None:
+                continue
+            if variant_image is not base_image:
+                variant_buffer = variant_image
 
-            if all_results:
-                all_results.sort(key=lambda x: x['quality_scores']['overall'] * x['confidence'], reverse=True)
-                best_result = all_results[0]
-                
-                self.logger.info(
-                    f"Лучший результат: метод={best_result['preprocessing_method']}, "
-                    f"вариант={best_result['image_variant']}, "
-                    f"уверенность={best_result['confidence']:.3f}, "
-                    f"слов={best_result['word_count']}, "
-                    f"оценка качества={best_result['quality_scores']['overall']:.3f}"
-                )
-                
-                result = {
-                    'status': 'success',
-                    'text': best_result['text'],
-                    'raw_text': best_result.get('raw_text', ''),
-                    'confidence': best_result['confidence'],
-                    'quality_scores': best_result['quality_scores'],
-                    'preprocessing_method': best_result['preprocessing_method'],
-                    'image_variant': best_result['image_variant'],
-                    'word_count': best_result['word_count'],
-                    'character_count': best_result['character_count'],
-                    'all_attempts': len(all_results),
-                    'timestamp': pd.Timestamp.now().isoformat(),
-                    'specific_data': best_result['specific_data']
-                }
-            else:
-                self.logger.error("Не удалось извлечь текст ни одним методом")
-                result = {
-                    'status': 'error',
-                    'text': 'No reliable text found with any method',
-                    'confidence': 0.0,
-                    'quality_scores': {'overall': 0.0, 'structure': 0.0, 'readability': 0.0},
-                    'preprocessing_method': 'none',
-                    'word_count': 0,
-                    'character_count': 0,
-                    'all_attempts': 0,
-                    'timestamp': pd.Timestamp.now().isoformat(),
-                    'specific_data': {'phone_numbers': [], 'emails': [], 'domains': []}
-                }
+            try:
+                passes += 1
+                raw_text, avg_confidence = self.perform_tesseract_ocr(variant_image, languages)
+
+                if raw_text and avg_confidence >= self.min_confidence:
+                    cleaned_text = self.postprocess_layout(raw_text)
+                    quality_scores = self.calculate_text_quality(cleaned_text, avg_confidence)
+                    specific_data = self.extract_specific_data(cleaned_text)
+
+                    result_data = {
+                        'text': cleaned_text,
+                        'raw_text': raw_text,
+                        'confidence': avg_confidence,
+                        'quality_scores': quality_scores,
+                        'preprocessing_method': method_name,
+                        'image_variant': variant_name,
+                        'word_count': len(cleaned_text.split()),
+                        'character_count': len(cleaned_text),
+                        'specific_data': specific_data,
+                    }
 
-            return result
+                    successful_attempts += 1
+                    # Храним только лучший результат; при равенстве остаётся более ранний
+                    if best_result is None or self.result_score(result_data) > self.result_score(best_result):
+                        best_result = result_data
+                    self.logger.info(
+                        f"Найден текст ({method_name}, {variant_name}): "
+                        f" ({avg_confidence:.3f})"
+                    )
 
-        finally:
-            self.cleanup_tmp()
+                    if early_exit and self.is_good_enough(result_data):
+                        self.logger.info(f"Ранний выход после ({method_name}, {variant_name})")
+                        exited_early = True
+                        break
 
-    async def perform_ocr_async(self, file_path: str) -> Dict[str, Any]:
+            except Exception as e:
+                self.logger.warning(f"Ошибка при обработке варианта {variant_name}: {e}")
+                continue
+
+        base_images.clear()
+        variant_buffer = None
+
+        if best_result is None and pipeline is not None:
+            self.logger.info("Пробуем фолбэк: обработка без препроцессинга")
+            # Выбор языка мог ошибиться — фолбэк идёт с полным набором
+            languages = self.languages
+            try:
+                original_image = pipeline.image
+                if original_image is not None:
+                    raw_text, avg_confidence = self.perform_tesseract_ocr(original_image, languages)
+                    if raw_text and avg_confidence > 0.1:
+                        cleaned_text = self.postprocess_layout(raw_text)
+                        quality_scores = self.calculate_text_quality(cleaned_text, avg_confidence)
+                        specific_data = self.extract_specific_data(cleaned_text)
+
+                        successful_attempts += 1
+                        best_result = {
+                            'text': cleaned_text,
+                            'raw_text': raw_text,
+                            'confidence': avg_confidence,
+                            'quality_scores': quality_scores,
+                            'preprocessing_method': 'fallback',
+                            'image_variant': 'original',
+                            'word_count': len(cleaned_text.split()),
+                            'character_count': len(cleaned_text),
+                            'specific_data': specific_data
+                        }
+            except Exception as e:
+                self.logger.error(f"Фолбэк метод не сработал: {e}")
+
+        if best_result is not None:
+            winner = f"{best_result['preprocessing_method']}:{best_result['image_variant']}"
+
+            self.logger.info(
+                f"Лучший результат: метод={best_result['preprocessing_method']}, "
+                f"вариант={best_result['image_variant']}, "
+                f"уверенность={best_result['confidence']:.3f}, "
+                f"слов={best_result['word_count']}, "
+                f"оценка качества={best_result['quality_scores']['overall']:.3f}"
+            )
+
+            result = {
+                'status': 'success',
+                'text': best_result['text'],
+                'raw_text': best_result.get('raw_text', ''),
+                'confidence': best_result['confidence'],
+                'quality_scores': best_result['quality_scores'],
+                'preprocessing_method': best_result['preprocessing_method'],
+                'image_variant': best_result['image_variant'],
+                'word_count': best_result['word_count'],
+                'character_count': best_result['character_count'],
+                'all_attempts': successful_attempts,
+                'rotation': pipeline.rotation,
+                'skew_angle': pipeline.skew_angle,
+                'languages': languages,
+                'predicted_strategy': f"{predicted[0]}:{predicted[1]}" if predicted else None,
+                'image_stats': image_stats,
+                'timestamp': datetime.now().isoformat(),
+                'specific_data': best_result['specific_data']
+            }
+        else:
+            winner = None
+            self.logger.error("Не удалось извлечь текст ни одним методом")
+            result = {
+                'status': 'error',
+                'text': 'No reliable text found with any method',
+                'confidence': 0.0,
+                'quality_scores': {'overall': 0.0, 'structure': 0.0, 'readability': 0.0},
+                'preprocessing_method': 'none',
+                'word_count': 0,
+                'character_count': 0,
+                'all_attempts': 0,
+                'timestamp': datetime.now().isoformat(),
+                'specific_data': {'phone_numbers': [], 'emails': [], 'domains': []}
+            }
+
+        if predicted:
+            predicted_name = f"{predicted[0]}:{predicted[1]}"
+            self.record_prediction({
+                'timestamp': result['timestamp'],
+                'source': os.path.basename(source_name),
+                'predicted': predicted_name,
+                'winner': winner,
+                'hit': predicted_name == winner,
+                'audit': audit,
+                'first_pass': exited_early and passes == 1,
+                'passes': passes,
+                'stats': image_stats,
+            })
+
+        return result
+
+    async def perform_ocr_async(
+        self, file_path: str, cancel_event: Optional[asyncio.Event] = None
+    ) -> Dict[str, Any]:
+        self.logger.info(f"Асинхронная обработка: {file_path}")
+        return await self._submit_ocr(file_path, _run_ocr_job, file_path, cancel_event=cancel_event)
+
+    async def perform_ocr_bytes_async(
+        self, data: bytes, name: str = "image", cancel_event: Optional[asyncio.Event] = None
+    ) -> Dict[str, Any]:
+        self.logger.info(f"Асинхронная обработка: {name}")
+        return await self._submit_ocr(name, _run_ocr_bytes_job, data, name, cancel_event=cancel_event)
+
+    async def perform_ocr_image_async(
+        self, image: np.ndarray, name: str = "image", cancel_event: Optional[asyncio.Event] = None
+    ) -> Dict[str, Any]:
+        self.logger.info(f"Асинхронная обработка изображения: {name}")
+        return await self._submit_ocr(name, _run_ocr_image_job, image, name, cancel_event=cancel_event)
+
+    async def _submit_ocr(
+        self,
+        file_path: str,
+        job: Callable[..., Dict[str, Any]],
+        *args: Any,
+        cancel_event: Optional[asyncio.Event] = None
+    ) -> Dict[str, Any]:
         try:
-            self.logger.info(f"Асинхронная обработка: {file_path}")
-            loop = asyncio.get_event_loop()
-            
-            with concurrent.futures.ThreadPoolExecutor() as pool:
-                result = await asyncio.wait_for(
-                    loop.run_in_executor(pool, self.perform_ocr_with_fallback, file_path),
-                    timeout=180.0  
-                )
-            return result
+            pool = get_ocr_pool(self.worker_config)
+            return await pool.submit(
+                job, *args, timeout=settings.OCR_TIMEOUT_SECONDS, cancel_event=cancel_event
+            )
             
         except asyncio.TimeoutError:
             self.logger.error(f"Таймаут обработки: {file_path}")
@@ -560,6 +1351,24 @@ class ProfessionalOCRProcessor:
                 'quality_scores': {'overall': 0.0, 'structure': 0.0, 'readability': 0.0},
                 'specific_data': {'phone_numbers': [], 'emails': [], 'domains': []}
             }
+        except OCRCancelledError:
+            self.logger.info(f"OCR отменён пользователем: {file_path}")
+            return {
+                'status': 'cancelled',
+                'text': 'OCR cancelled',
+                'confidence': 0.0,
+                'quality_scores': {'overall': 0.0, 'structure': 0.0, 'readability': 0.0},
+                'specific_data': {'phone_numbers': [], 'emails': [], 'domains': []}
+            }
+        except OCRQueueFullError:
+            self.logger.warning(f"Очередь OCR переполнена, файл отклонён: {file_path}")
+            return {
+                'status': 'error',
+                'text': 'OCR service is busy, try again later',
+                'confidence': 0.0,
+                'quality_scores': {'overall': 0.0, 'structure': 0.0, 'readability': 0.0},
+                'specific_data': {'phone_numbers': [], 'emails': [], 'domains': []}
+            }
         except Exception as e:
             self.logger.exception(f"Ошибка асинхронной обработки {file_path}: {e}")
             return {
@@ -569,81 +1378,105 @@ class ProfessionalOCRProcessor:
                 'quality_scores': {'overall': 0.0, 'structure': 0.0, 'readability': 0.0},
                 'specific_data': {'phone_numbers': [], 'emails': [], 'domains': []}
             }
-        finally:
-            try:
-                loop = asyncio.get_running_loop()
-            except RuntimeError:
-                loop = asyncio.new_event_loop()
-            loop.run_in_executor(None, self.cleanup_tmp)
 
     def batch_process(self, file_paths: List[str]) -> List[Dict[str, Any]]:
         results = []
         total_files = len(file_paths)
         
-        try:
-            for i, file_path in enumerate(file_paths, 1):
-                try:
-                    self.logger.info(f"Обработка файла {i}/{total_files}: {file_path}")
-                    result = self.perform_ocr_with_fallback(file_path)
-                    results.append({
-                        'file_path': file_path,
-                        'result': result,
-                        'processing_order': i
-                    })
-                    
-                except Exception as e:
-                    self.logger.exception(f"Ошибка обработки {file_path}: {e}")
-                    results.append({
-                        'file_path': file_path,
-                        'result': {
-                            'status': 'error',
-                            'text': f'Processing failed: {str(e)}'
-                        },
-                        'processing_order': i
-                    })
-                    
-            return results
-        finally:
-            self.cleanup_tmp()
+        for i, file_path in enumerate(file_paths, 1):
+            try:
+                self.logger.info(f"Обработка файла {i}/{total_files}: {file_path}")
+                result = self.perform_ocr_with_fallback(file_path)
+                results.append({
+                    'file_path': file_path,
+                    'result': result,
+                    'processing_order': i
+                })
+
+            except Exception as e:
+                self.logger.exception(f"Ошибка обработки {file_path}: {e}")
+                results.append({
+                    'file_path': file_path,
+                    'result': {
+                        'status': 'error',
+                        'text': f'Processing failed: {str(e)}'
+                    },
+                    'processing_order': i
+                })
+
+        return results
+
+    async def iter_batch_async(
+        self,
+        file_paths: List[str],
+        max_concurrent: Optional[int] = None,
+        ordered: bool = False,
+        progress: Optional[Callable[[int, int, Dict[str, Any]], Any]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        total = len(file_paths)
+        max_concurrent = max(1, max_concurrent or settings.OCR_MAX_INFLIGHT)
+        queue = iter(enumerate(file_paths, 1))
+        running: Dict[asyncio.Task, Tuple[int, str]] = {}
+        ready: Dict[int, Dict[str, Any]] = {}
+        next_order = 1
+        completed = 0
+
+        def launch() -> None:
+            while len(running) < max_concurrent:
+                entry = next(queue, None)
+                if entry is None:
+                    break
+                order, file_path = entry
+                running[asyncio.create_task(self.perform_ocr_async(file_path))] = (order, file_path)
 
-    async def batch_process_async(self, file_paths: List[str], max_concurrent: int = 3) -> List[Dict[str, Any]]:
-        semaphore = Semaphore(max_concurrent)
-        
-        async def process_with_semaphore(file_path: str) -> Dict[str, Any]:
-            async with semaphore:
-                result = await self.perform_ocr_async(file_path)
-                return {'file_path': file_path, 'result': result}
-        
-        tasks = [process_with_semaphore(file_path) for file_path in file_paths]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        formatted_results = []
         try:
-            for i, (file_path, result) in enumerate(zip(file_paths, results), 1):
-                if isinstance(result, Exception):
-                    self.logger.exception(f"Исключение при обработке {file_path}: {result}")
-                    formatted_results.append({
-                        'file_path': file_path,
-                        'result': {
-                            'status': 'error',
-                            'text': f'Exception: {str(result)}'
-                        },
-                        'processing_order': i
-                    })
-                else:
-                    formatted_results.append({
-                        'file_path': file_path,
-                        'result': result['result'],
-                        'processing_order': i
-                    })
-            
-            return formatted_results
+            launch()
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                finished = []
+                for task in done:
+                    order, file_path = running.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        self.logger.exception(f"Исключение при обработке {file_path}: {e}")
+                        result = {'status': 'error', 'text': f'Exception: {str(e)}'}
+                    finished.append({'file_path': file_path, 'result': result, 'processing_order': order})
+                # Следующие файлы стартуют до того, как потребитель заберёт готовые
+                launch()
+
+                for item in sorted(finished, key=lambda x: x['processing_order']):
+                    completed += 1
+                    if progress is not None:
+                        try:
+                            outcome = progress(completed, total, item)
+                            if inspect.isawaitable(outcome):
+                                await outcome
+                        except Exception as e:
+                            self.logger.warning(f"Ошибка в обработчике прогресса: {e}")
+                    if ordered:
+                        ready[item['processing_order']] = item
+                    else:
+                        yield item
+
+                while next_order in ready:
+                    yield ready.pop(next_order)
+                    next_order += 1
         finally:
-            try:
-                loop = asyncio.get_running_loop()
-            except RuntimeError:
-                loop = asyncio.new_event_loop()
-            loop.run_in_executor(None, self.cleanup_tmp)
+            for task in running:
+                task.cancel()
+
+    async def batch_process_async(
+        self,
+        file_paths: List[str],
+        max_concurrent: int = 3,
+        progress: Optional[Callable[[int, int, Dict[str, Any]], Any]] = None
+    ) -> List[Dict[str, Any]]:
+        return [
+            item async for item in self.iter_batch_async(
+                file_paths, max_concurrent=max_concurrent, ordered=True, progress=progress
+            )
+        ]
 
     def export_results(self, results: List[Dict[str, Any]], output_format: str = 'json') -> Any:
         try:
@@ -686,6 +1519,558 @@ class ProfessionalOCRProcessor:
 
 
 
+# --- Shared OCR worker pool ---
+class OCRQueueFullError(RuntimeError):
+    pass
+
+
+class OCRCancelledError(RuntimeError):
+    pass
+
+
+_WORKER_PROCESSOR: Optional[ProfessionalOCRProcessor] = None
+
+
+def _init_ocr_worker(processor_config: Dict[str, Any], scratch_dir: str) -> None:
+    global _WORKER_PROCESSOR
+    _WORKER_PROCESSOR = ProfessionalOCRProcessor(**processor_config)
+    # Временные файлы pytesseract — в scratch воркера (tmpfs, если есть); удаляет его родитель
+    tempfile.tempdir = scratch_dir
+
+
+def _run_ocr_job(file_path: str) -> Dict[str, Any]:
+    return _WORKER_PROCESSOR.perform_ocr_with_fallback(file_path)
+
+
+def _run_ocr_bytes_job(data: bytes, name: str) -> Dict[str, Any]:
+    return _WORKER_PROCESSOR.perform_ocr_on_bytes(data, name)
+
+
+def _run_ocr_image_job(image: np.ndarray, name: str) -> Dict[str, Any]:
+    return _WORKER_PROCESSOR.perform_ocr_on_image(image, name)
+
+
+def _extract_pdf_range_job(source: Union[str, bytes], start: int, stop: int) -> List[Tuple[str, bool]]:
+    doc = fitz.open(stream=source, filetype="pdf") if isinstance(source, bytes) else fitz.open(source)
+    try:
+        return [FileConvertToText.read_pdf_page_text(doc[index]) for index in range(start, stop)]
+    finally:
+        doc.close()
+
+
+def _ocr_worker_main(processor_config: Dict[str, Any], scratch_dir: str, conn: Any) -> None:
+    _init_ocr_worker(processor_config, scratch_dir)
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            break
+        if request is None:
+            break
+        func, args = request
+        try:
+            response = ('ok', func(*args))
+        except Exception as e:
+            response = ('error', e)
+        try:
+            conn.send(response)
+        except Exception as e:
+            conn.send(('error', RuntimeError(f"{type(e).__name__}: {e}")))
+
+
+def _resolve_scratch_root() -> str:
+    if settings.OCR_SCRATCH_ROOT:
+        return settings.OCR_SCRATCH_ROOT
+    # tmpfs, если доступен: промежуточные файлы не идут на диск
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return os.path.join("/dev/shm", "safety_checker_ocr")
+    return os.path.join("tmp", "ocr_jobs")
+
+
+class _OCRWorker:
+    def __init__(self, context: Any, processor_config: Dict[str, Any], scratch_root: str):
+        # Папку создаёт родитель: после SIGKILL воркер сам за собой не уберёт
+        self.scratch_dir = tempfile.mkdtemp(prefix=f"worker_{os.getpid()}_", dir=scratch_root)
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_ocr_worker_main, args=(processor_config, self.scratch_dir, child_conn), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def call(self, func: Callable[..., Any], args: Tuple[Any, ...]) -> Tuple[str, Any]:
+        try:
+            self.conn.send((func, args))
+            return self.conn.recv()
+        except (EOFError, OSError) as e:
+            return ('died', e)
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+        shutil.rmtree(self.scratch_dir, ignore_errors=True)
+
+    def close(self) -> None:
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+            shutil.rmtree(self.scratch_dir, ignore_errors=True)
+
+
+class OCRWorkerPool:
+    def __init__(
+        self,
+        processor_config: Dict[str, Any],
+        max_workers: Optional[int] = None,
+        max_inflight: Optional[int] = None,
+        max_queue: Optional[int] = None
+    ):
+        self.processor_config = processor_config
+        self.max_workers = max(1, max_workers or settings.OCR_WORKERS)
+        self.max_inflight = max(1, max_inflight or settings.OCR_MAX_INFLIGHT)
+        self.max_queue = settings.OCR_MAX_QUEUE if max_queue is None else max_queue
+        self.logger = logging.getLogger("ProfessionalOCRProcessor")
+
+        # spawn: воркеры не наследуют event loop, потоки и соединения бота
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: deque = deque()
+        self._workers: set = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._waiting = 0
+        self._inflight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._killed = 0
+        self.scratch_root = _resolve_scratch_root()
+        os.makedirs(self.scratch_root, exist_ok=True)
+        self._sweep_scratch()
+
+    def _sweep_scratch(self) -> None:
+        # Папки воркеров, чей родительский процесс уже не существует (бот упал или был убит)
+        if os.name != 'posix':
+            return
+        for entry in os.scandir(self.scratch_root):
+            match = re.match(r"worker_(\d+)_", entry.name)
+            if not match or not entry.is_dir():
+                continue
+            try:
+                os.kill(int(match.group(1)), 0)
+            except ProcessLookupError:
+                shutil.rmtree(entry.path, ignore_errors=True)
+            except PermissionError:
+                continue
+
+    def _acquire_worker(self) -> _OCRWorker:
+        while self._idle:
+            worker = self._idle.pop()
+            if worker.is_alive():
+                return worker
+            self._kill(worker)
+        worker = _OCRWorker(self._context, self.processor_config, self.scratch_root)
+        self._workers.add(worker)
+        if len(self._workers) == 1:
+            self.logger.info(f"OCR пул запущен: процессов={self.max_workers}, одновременно={self.max_inflight}")
+        return worker
+
+    def _kill(self, worker: _OCRWorker) -> None:
+        self._workers.discard(worker)
+        try:
+            worker.kill()
+        except Exception as e:
+            self.logger.warning(f"Не удалось остановить OCR воркер: {e}")
+
+    @staticmethod
+    async def _wait_or_cancel(
+        task: asyncio.Future,
+        cancel_event: Optional[asyncio.Event],
+        timeout: Optional[float] = None
+    ) -> Any:
+        waiters = {task}
+        cancel_wait = None
+        if cancel_event is not None:
+            cancel_wait = asyncio.ensure_future(cancel_event.wait())
+            waiters.add(cancel_wait)
+        try:
+            done, _ = await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if cancel_wait is not None:
+                cancel_wait.cancel()
+        if task in done:
+            return task.result()
+        task.cancel()
+        if cancel_event is not None and cancel_event.is_set():
+            raise OCRCancelledError("OCR job cancelled")
+        raise asyncio.TimeoutError()
+
+    async def submit(
+        self,
+        func: Callable[..., Any],
+        *args: Any,
+        timeout: Optional[float] = None,
+        cancel_event: Optional[asyncio.Event] = None
+    ) -> Any:
+        if self._semaphore is None:
+            # Каждой выполняемой задаче нужен свой процесс
+            self._semaphore = asyncio.Semaphore(min(self.max_inflight, self.max_workers))
+
+        # Решение по счётчикам: семафор захватывается только на следующем шаге цикла событий,
+        # и пачка задач из одного тика иначе проходит проверку целиком
+        if self._inflight + self._waiting >= min(self.max_inflight, self.max_workers) + self.max_queue:
+            self._rejected += 1
+            raise OCRQueueFullError(f"OCR queue is full ({self._waiting} waiting)")
+
+        self._waiting += 1
+        acquire = asyncio.ensure_future(self._semaphore.acquire())
+        try:
+            await self._wait_or_cancel(acquire, cancel_event)
+        except BaseException:
+            if acquire.done() and not acquire.cancelled():
+                self._semaphore.release()
+            else:
+                acquire.cancel()
+            raise
+        finally:
+            self._waiting -= 1
+
+        self._inflight += 1
+        try:
+            worker = self._acquire_worker()
+            future = asyncio.get_running_loop().run_in_executor(None, worker.call, func, args)
+            try:
+                status, payload = await self._wait_or_cancel(future, cancel_event, timeout)
+            except BaseException:
+                # Таймаут или отмена: процесс убивается сразу, ядро освобождается, на его место придёт новый
+                future.cancel()
+                self._kill(worker)
+                self._killed += 1
+                raise
+
+            if status == 'died':
+                self.logger.error("OCR воркер упал, будет запущен новый")
+                self._kill(worker)
+                raise RuntimeError("OCR worker process died") from payload
+            self._idle.append(worker)
+            if status == 'error':
+                raise payload
+            self._completed += 1
+            return payload
+        finally:
+            self._inflight -= 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'workers': self.max_workers,
+            'processes': len(self._workers),
+            'max_inflight': self.max_inflight,
+            'inflight': self._inflight,
+            'waiting': self._waiting,
+            'completed': self._completed,
+            'rejected': self._rejected,
+            'killed': self._killed,
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        idle = set(self._idle)
+        self._idle.clear()
+        for worker in list(self._workers):
+            if wait and worker in idle:
+                worker.close()
+                self._workers.discard(worker)
+            else:
+                self._kill(worker)
+
+
+_OCR_POOLS: Dict[Tuple[Any, ...], OCRWorkerPool] = {}
+
+
+def get_ocr_pool(processor_config: Dict[str, Any]) -> OCRWorkerPool:
+    key = tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in processor_config.items()))
+    pool = _OCR_POOLS.get(key)
+    if pool is None:
+        pool = OCRWorkerPool(processor_config)
+        _OCR_POOLS[key] = pool
+    return pool
+
+
+
+
+# --- OCR result cache ---
+class OCRResultCache:
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_memory_items: Optional[int] = None,
+        max_disk_mb: Optional[float] = None
+    ):
+        self.cache_dir = cache_dir or settings.OCR_CACHE_DIR
+        self.max_memory_items = settings.OCR_CACHE_MEMORY_ITEMS if max_memory_items is None else max_memory_items
+        self.max_disk_bytes = int((settings.OCR_CACHE_MAX_MB if max_disk_mb is None else max_disk_mb) * 1024 * 1024)
+        self.logger = logging.getLogger("FileConvertToText")
+
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(data: bytes, config_key: str) -> str:
+        digest = hashlib.sha256(data)
+        digest.update(b"\0")
+        digest.update(config_key.encode('utf-8'))
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return result
+
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        except Exception as e:
+            self.logger.error(f"OCR cache read failed {path}: {e}")
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self._remember(key, result)
+            self.hits += 1
+        return result
+
+    def set(self, key: str, result: Dict[str, Any]) -> None:
+        with self._lock:
+            self._remember(key, result)
+
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            self.logger.error(f"OCR cache write failed {path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += size
+            if self._disk_bytes is None or self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _remember(self, key: str, result: Dict[str, Any]) -> None:
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self) -> None:
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith('.json'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        # Выселяем самые давно использованные, оставляя запас 10%
+        target = int(self.max_disk_bytes * 0.9)
+        if total > self.max_disk_bytes:
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    continue
+        self._disk_bytes = total
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'memory_items': len(self._memory),
+                'disk_bytes': self._disk_bytes,
+            }
+
+
+
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+_DOCX_PART = re.compile(r"word/(header|footer)(\d*)\.xml$")
+
+
+def _docx_parts(names: List[str]) -> List[Tuple[str, str]]:
+    # Колонтитулы оборачивают основной текст: сначала верхние, затем тело, затем нижние
+    found = {"header": [], "footer": []}
+    for name in names:
+        match = _DOCX_PART.match(name)
+        if match:
+            found[match.group(1)].append((int(match.group(2) or 0), name))
+    parts = [("header", name) for _, name in sorted(found["header"])]
+    parts.append(("body", "word/document.xml"))
+    parts.extend(("footer", name) for _, name in sorted(found["footer"]))
+    return parts
+
+
+def _iter_docx_part(stream: Any) -> Iterator[Tuple[str, str]]:
+    # Стек абзацев: абзац из надписи (txbxContent) вложен в абзац документа
+    paragraphs: List[List[str]] = []
+    cells: List[List[str]] = []
+    rows: List[List[str]] = []
+    fallback = 0
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        tag = elem.tag
+        if tag == _MC_FALLBACK:
+            # Word хранит надпись дважды (DrawingML и VML-копия в Fallback) — копия пропускается
+            fallback += 1 if event == "start" else -1
+            if event == "end":
+                elem.clear()
+            continue
+        if fallback:
+            continue
+        if event == "start":
+            if tag == _W + "tr":
+                rows.append([])
+            elif tag == _W + "tc":
+                cells.append([])
+            elif tag == _W + "p":
+                paragraphs.append([])
+            continue
+
+        if tag == _W + "t":
+            if paragraphs:
+                paragraphs[-1].append(elem.text or "")
+        elif tag == _W + "tab":
+            if paragraphs:
+                paragraphs[-1].append("\t")
+        elif tag in (_W + "br", _W + "cr"):
+            if paragraphs:
+                paragraphs[-1].append("\n")
+        elif tag == _W + "p":
+            text = "".join(paragraphs.pop())
+            if cells:
+                cells[-1].append(text)
+            elif text.strip():
+                yield "paragraph", text
+            elem.clear()
+        elif tag == _W + "tc":
+            text = "\n".join(p for p in cells.pop() if p.strip())
+            if rows:
+                rows[-1].append(text)
+            elem.clear()
+        elif tag == _W + "tr":
+            row = rows.pop()
+            if any(cell.strip() for cell in row):
+                line = " | ".join(cell.replace("\n", " ") for cell in row)
+                # Вложенная таблица становится текстом ячейки, в которой лежит
+                if cells:
+                    cells[-1].append(line)
+                else:
+                    yield "table", line
+            elem.clear()
+
+
+def iter_docx_blocks(source: Union[str, bytes]) -> Iterator[Tuple[str, str]]:
+    data = io.BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source
+    with zipfile.ZipFile(data) as archive:
+        names = archive.namelist()
+        for kind, name in _docx_parts(names):
+            if kind != "body" and name not in names:
+                continue
+            with archive.open(name) as stream:
+                for block_kind, text in _iter_docx_part(stream):
+                    yield (kind if kind != "body" else block_kind), text
+
+
+def docx_inflated_size(source: Union[str, bytes]) -> int:
+    data = io.BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source
+    try:
+        with zipfile.ZipFile(data) as archive:
+            return sum(info.file_size for info in archive.infolist() if info.filename.startswith("word/"))
+    except zipfile.BadZipFile:
+        # Не zip — вероятно, переименованный .doc
+        return -1
+
+
+_OFFICE_SEMAPHORE: Optional[asyncio.Semaphore] = None
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def run_office_sandbox(data: bytes, cancel_event: Optional[asyncio.Event] = None) -> Dict[str, Any]:
+    global _OFFICE_SEMAPHORE
+    if _OFFICE_SEMAPHORE is None:
+        _OFFICE_SEMAPHORE = asyncio.Semaphore(max(1, settings.OFFICE_SANDBOX_WORKERS))
+
+    async with _OFFICE_SEMAPHORE:
+        # Каждый документ разбирается в свежем процессе с лимитами памяти и CPU; зависший процесс убивается
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "functions.office_worker",
+            str(settings.OFFICE_SANDBOX_MEMORY_MB), str(settings.OFFICE_SANDBOX_CPU_SECONDS),
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            cwd=_PROJECT_ROOT
+        )
+        task = asyncio.ensure_future(proc.communicate(bytes(data)))
+        try:
+            stdout, stderr = await OCRWorkerPool._wait_or_cancel(
+                task, cancel_event, settings.OFFICE_SANDBOX_TIMEOUT_SECONDS
+            )
+        except OCRCancelledError:
+            return {"status": "cancelled", "text": "", "metadata": {}}
+        except asyncio.TimeoutError:
+            return {"status": "error", "text": "Office conversion timed out", "metadata": {"source": "aspose-sandbox"}}
+        finally:
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+
+    if proc.returncode < 0:
+        return {
+            "status": "error",
+            "text": f"Office conversion killed by signal {-proc.returncode}",
+            "metadata": {"source": "aspose-sandbox"}
+        }
+    try:
+        return json.loads(stdout.decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return {
+            "status": "error",
+            "text": f"Office conversion failed: {stderr.decode('utf-8', 'replace')[-500:].strip()}",
+            "metadata": {"source": "aspose-sandbox"}
+        }
 
 
 class FileConvertToText:
@@ -713,10 +2098,57 @@ class FileConvertToText:
         handler.setFormatter(formatter)
         self.logger.addHandler(handler)
 
-        self.ocr_processor = ProfessionalOCRProcessor(
-            languages=['eng', 'rus'],
-            min_confidence=0.5
-            )
+        self._ocr_processor: Optional[ProfessionalOCRProcessor] = None
+        self.ocr_cache = OCRResultCache() if settings.OCR_CACHE_ENABLED else None
+
+    @property
+    def ocr_processor(self) -> ProfessionalOCRProcessor:
+        # OCR-процессор (и проверка версии tesseract) создаётся при первом изображении, а не при импорте бота
+        if self._ocr_processor is None:
+            self._ocr_processor = ProfessionalOCRProcessor(
+                languages=['eng', 'rus'],
+                min_confidence=0.5
+                )
+        return self._ocr_processor
+
+    # --- Sources: path or in-memory bytes ---
+    @staticmethod
+    def is_buffer(source: Any) -> bool:
+        return isinstance(source, (bytes, bytearray, memoryview))
+
+    @staticmethod
+    def as_bytes(source: Union[bytes, bytearray, memoryview, io.IOBase]) -> bytes:
+        if isinstance(source, bytes):
+            return source
+        if isinstance(source, io.BytesIO):
+            return source.getvalue()
+        if isinstance(source, io.IOBase):
+            return source.read()
+        return bytes(source)
+
+    def check_source(self, source: Union[str, bytes]) -> Optional[dict]:
+        if self.is_buffer(source):
+            if len(source) > self.MAX_SIZE_BYTES:
+                return {"status": "error", "text": "File too large (max 10 MB)", "metadata": {}}
+            return None
+        path = Path(source)
+        if not path.exists() or not path.is_file():
+            return {"status": "error", "text": "File does not exist", "metadata": {}}
+        if path.stat().st_size > self.MAX_SIZE_BYTES:
+            return {"status": "error", "text": "File too large (max 10 MB)", "metadata": {}}
+        return None
+
+    def get_buffer_format(self, data: bytes, file_name: str) -> Dict[str, Any]:
+        if len(data) > self.MAX_SIZE_BYTES:
+            return {"error": "File is too large (max 10 MB)", "status": "error"}
+        mime_type, _ = mimetypes.guess_type(file_name)
+        return {
+            "status": "success",
+            "extension": Path(file_name).suffix.lower(),
+            "mime_type": mime_type or "unknown",
+            "size_bytes": len(data),
+            "size_human": f"{len(data) / (1024 * 1024):.2f} MB"
+        }
 
     # --- File info ---
     async def get_file_format(self, file_path: str) -> Dict[str, Any]:
@@ -735,70 +2167,341 @@ class FileConvertToText:
         }
 
     # --- Word ---
-    async def read_word(self, file_path: str) -> dict:
-        path = Path(file_path)
-        if not path.exists() or not path.is_file():
-            return {"status": "error", "text": "File does not exist", "metadata": {}}
-        if path.stat().st_size > self.MAX_SIZE_BYTES:
-            return {"status": "error", "text": "File too large (max 10 MB)", "metadata": {}}
+    async def needs_office_sandbox(self, source: Union[str, bytes], ext: str) -> bool:
+        if ext != '.docx':
+            return True
+        inflated = await asyncio.to_thread(docx_inflated_size, source if self.is_buffer(source) else str(source))
+        return inflated < 0 or inflated > settings.OFFICE_SANDBOX_MIN_INFLATED_MB * 1024 * 1024
+
+    async def read_word(self, source: Union[str, bytes]) -> dict:
+        error = self.check_source(source)
+        if error:
+            return error
 
         def extract_docx():
             try:
-                doc = docx.Document(str(path))
-                paragraphs = [p.text for p in doc.paragraphs if p.text.strip()]
-                text = "\n".join(paragraphs)
+                blocks = list(iter_docx_blocks(source if self.is_buffer(source) else str(source)))
+                kinds = Counter(kind for kind, _ in blocks)
+                text = "\n".join(block for _, block in blocks)
                 metadata = {
-                    "paragraph_count": len(paragraphs),
+                    "paragraph_count": kinds["paragraph"],
+                    "table_row_count": kinds["table"],
+                    "header_count": kinds["header"],
+                    "footer_count": kinds["footer"],
                     "word_count": len(text.split()),
-                    "source": "python-docx"
+                    "source": "docx-xml"
                 }
                 return {"status": "success", "text": text, "metadata": metadata}
+            except (zipfile.BadZipFile, KeyError, ET.ParseError) as e:
+                return {"status": "error", "text": f"DOCX parsing failed: {str(e)}", "metadata": {}}
             except Exception as e:
-                return {"status": "error", "text": f"python-docx failed: {str(e)}", "metadata": {}}
+                self.logger.exception(e)
+                return {"status": "error", "text": f"DOCX parsing failed: {str(e)}", "metadata": {}}
 
         return await asyncio.to_thread(extract_docx)
 
     # --- PDF ---
-    async def pdf_to_text_async(self, file_path: str) -> dict:
-        path = Path(file_path)
-        if not path.exists() or not path.is_file():
-            return {"status": "error", "text": "File does not exist", "metadata": {}}
-        if path.stat().st_size > self.MAX_SIZE_BYTES:
-            return {"status": "error", "text": "File too large (max 10 MB)", "metadata": {}}
+    @staticmethod
+    def read_pdf_page_text(page: Any) -> Tuple[str, bool]:
+        text = page.get_text()
+        scanned = len(text.strip()) < settings.PDF_OCR_MIN_TEXT_CHARS and bool(page.get_images(full=False))
+        return text, scanned
+
+    @staticmethod
+    def _render_pdf_page(doc: Any, index: int) -> np.ndarray:
+        pix = doc[index].get_pixmap(dpi=settings.PDF_OCR_DPI, colorspace=fitz.csGRAY, alpha=False)
+        return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width].copy()
+
+    def _read_pdf_page(self, doc: Any, index: int, render: bool) -> Tuple[str, Optional[np.ndarray], bool]:
+        text, scanned = self.read_pdf_page_text(doc[index])
+        if not scanned or not render:
+            return text, None, scanned
+        return text, self._render_pdf_page(doc, index), True
+
+    async def _start_pdf_chunks(
+        self, source: Union[str, bytes], page_limit: int, cancel_event: Optional[asyncio.Event]
+    ) -> Tuple[List[Tuple[int, int, asyncio.Task]], Optional[str]]:
+        # Каждый диапазон страниц открывает документ в своём процессе; порядок восстанавливается по индексу
+        pool = get_ocr_pool(self.ocr_processor.worker_config)
+        stats = pool.stats()
+        # Одно место в пуле всегда остаётся фото и сканам; при занятом пуле параллельное чтение не окупается
+        free = min(stats['max_inflight'], stats['workers']) - stats['inflight'] - stats['waiting'] - 1
+        count = min(free, math.ceil(page_limit / max(1, settings.PDF_PARALLEL_CHUNK_PAGES)))
+        if count < 2:
+            return [], None
+
+        temp_path = None
+        job_source = str(source)
+        if self.is_buffer(source):
+            # Воркеры открывают один временный файл, а не получают копию PDF в каждой задаче
+            fd, temp_path = tempfile.mkstemp(suffix=".pdf", dir=pool.scratch_root)
+            with os.fdopen(fd, 'wb') as f:
+                await asyncio.to_thread(f.write, source)
+            job_source = temp_path
+
+        size = math.ceil(page_limit / count)
+        chunks = []
+        for start in range(0, page_limit, size):
+            stop = min(page_limit, start + size)
+            task = asyncio.create_task(pool.submit(
+                _extract_pdf_range_job, job_source, start, stop,
+                timeout=settings.OCR_TIMEOUT_SECONDS, cancel_event=cancel_event
+            ))
+            chunks.append((start, stop, task))
+        return chunks, temp_path
+
+    async def _read_chunked_pdf_page(
+        self, doc: Any, chunks: List[Tuple[int, int, asyncio.Task]], index: int
+    ) -> Tuple[str, bool]:
+        size = chunks[0][1] - chunks[0][0]
+        start, _, task = chunks[index // size]
+        try:
+            return tuple((await task)[index - start])
+        except (asyncio.CancelledError, OCRCancelledError):
+            raise
+        except Exception as e:
+            # Пул занят или воркер упал — страница читается здесь же
+            self.logger.warning(f"Параллельное чтение PDF не удалось, страница {index + 1}: {e}")
+            return await asyncio.to_thread(self.read_pdf_page_text, doc[index])
+
+    async def iter_pdf_pages(
+        self,
+        source: Union[str, bytes],
+        cancel_event: Optional[asyncio.Event] = None,
+        file_name: Optional[str] = None,
+        max_pages: Optional[int] = None,
+        max_chars: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        # Бюджет страниц/символов: дальше бюджета документ не читается и не распознаётся.
+        # Вызывающий может и сам остановиться раньше — незавершённый OCR отменяется при закрытии генератора
+        pages = self._iter_pdf_pages(source, cancel_event, file_name, max_pages)
+        collected = 0
+        try:
+            async for page in pages:
+                if max_chars and collected + len(page['text']) > max_chars:
+                    page['text'] = page['text'][:max_chars - collected]
+                    page['truncated'] = True
+                collected += len(page['text'])
+                yield page
+                if max_chars and collected >= max_chars:
+                    break
+        finally:
+            await pages.aclose()
+
+    async def _iter_pdf_pages(
+        self,
+        source: Union[str, bytes],
+        cancel_event: Optional[asyncio.Event] = None,
+        file_name: Optional[str] = None,
+        max_pages: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        if self.is_buffer(source):
+            doc = await asyncio.to_thread(fitz.open, stream=source, filetype="pdf")
+            name = file_name or "document.pdf"
+        else:
+            doc = await asyncio.to_thread(fitz.open, str(source))
+            name = Path(source).name
+        pending: deque = deque()
+        max_pending = max(1, settings.OCR_MAX_INFLIGHT)
+        ocr_pages = 0
+
+        async def resolve(item: Dict[str, Any]) -> Dict[str, Any]:
+            task = item.pop('task', None)
+            if task is not None:
+                result = await task
+                if isinstance(result, dict) and result.get('status') == 'success':
+                    item['text'] = result.get('text', '') + "\n"
+                    item['confidence'] = result.get('confidence', 0.0)
+                else:
+                    item['status'] = 'error'
+            return item
 
-        def extract_pdf():
-            try:
-                doc = fitz.open(str(path))
-                text = "".join([page.get_text() for page in doc])
-                metadata = {"page_count": len(doc), "source": "PyMuPDF"}
-                return {"status": "success", "text": text, "metadata": metadata}
-            except Exception as e:
-                return {"status": "error", "text": f"PDF read failed: {str(e)}", "metadata": {}}
+        chunks: List[Tuple[int, int, asyncio.Task]] = []
+        chunk_file = None
+        try:
+            page_count = len(doc)
+            page_limit = min(page_count, max_pages) if max_pages else page_count
+            if page_limit >= settings.PDF_PARALLEL_MIN_PAGES:
+                chunks, chunk_file = await self._start_pdf_chunks(source, page_limit, cancel_event)
+
+            for index in range(page_limit):
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                render = ocr_pages < settings.PDF_OCR_MAX_PAGES
+                if chunks:
+                    text, scanned = await self._read_chunked_pdf_page(doc, chunks, index)
+                    image = await asyncio.to_thread(self._render_pdf_page, doc, index) if scanned and render else None
+                else:
+                    text, image, scanned = await asyncio.to_thread(self._read_pdf_page, doc, index, render)
+                item = {'page': index + 1, 'page_count': page_count, 'text': text, 'source': 'text', 'status': 'success'}
+                if scanned and image is not None:
+                    ocr_pages += 1
+                    item['source'] = 'ocr'
+                    item['task'] = asyncio.create_task(
+                        self.ocr_processor.perform_ocr_image_async(
+                            image, f"{name}#page{index + 1}", cancel_event=cancel_event
+                        )
+                    )
+                elif scanned:
+                    item['source'] = 'skipped'
+                pending.append(item)
+
+                # Страницы отдаются по порядку, как только готовы все предыдущие
+                while pending and ('task' not in pending[0] or pending[0]['task'].done()):
+                    yield await resolve(pending.popleft())
+                while sum(1 for p in pending if 'task' in p) >= max_pending:
+                    yield await resolve(pending.popleft())
+
+            while pending:
+                yield await resolve(pending.popleft())
+        finally:
+            for item in pending:
+                task = item.get('task')
+                if task is not None:
+                    task.cancel()
+            for _, _, task in chunks:
+                task.cancel()
+            if chunk_file is not None:
+                try:
+                    os.remove(chunk_file)
+                except OSError:
+                    pass
+            doc.close()
+
+    async def pdf_to_text_async(
+        self,
+        source: Union[str, bytes],
+        cancel_event: Optional[asyncio.Event] = None,
+        file_name: Optional[str] = None,
+        max_pages: Optional[int] = None,
+        max_chars: Optional[int] = None
+    ) -> dict:
+        error = self.check_source(source)
+        if error:
+            return error
+        max_pages = settings.PDF_TEXT_MAX_PAGES if max_pages is None else max_pages
+        max_chars = settings.PDF_TEXT_MAX_CHARS if max_chars is None else max_chars
 
-        return await asyncio.to_thread(extract_pdf)
+        try:
+            pages = [
+                page async for page in self.iter_pdf_pages(source, cancel_event, file_name, max_pages, max_chars)
+            ]
+            if cancel_event is not None and cancel_event.is_set():
+                return {"status": "cancelled", "text": "Cancelled", "metadata": {}}
+            text = "".join(page['text'] for page in pages)
+            total_pages = pages[0]['page_count'] if pages else 0
+            metadata = {
+                "page_count": len(pages),
+                "total_pages": total_pages,
+                "truncated": len(pages) < total_pages or any(page.get('truncated') for page in pages),
+                "ocr_pages": sum(1 for page in pages if page['source'] == 'ocr'),
+                "skipped_pages": sum(1 for page in pages if page['source'] == 'skipped'),
+                "source": "PyMuPDF"
+            }
+            return {"status": "success", "text": text, "metadata": metadata}
+        except Exception as e:
+            # Отмена из параллельного чтения страниц не должна выглядеть как ошибка файла
+            if isinstance(e, OCRCancelledError) or (cancel_event is not None and cancel_event.is_set()):
+                return {"status": "cancelled", "text": "Cancelled", "metadata": {}}
+            return {"status": "error", "text": f"PDF read failed: {str(e)}", "metadata": {}}
 
     # --- CSV / Excel ---
-    async def read_csv_or_excel(self, file_path: str) -> dict:
-        path = Path(file_path)
-        if not path.exists() or not path.is_file():
-            return {"status": "error", "text": "File does not exist", "metadata": {}}
-        if path.stat().st_size > self.MAX_SIZE_BYTES:
-            return {"status": "error", "text": "File too large (max 10 MB)", "metadata": {}}
+    @staticmethod
+    def render_table(df: "pd.DataFrame") -> List[str]:
+        columns = df.columns.astype(str)
+        lines = [" | ".join(columns), "-|-".join("-" * len(col) for col in columns)]
+        if df.empty or not len(df.columns):
+            return lines
+        # Построчный iterrows заменён склейкой столбцов целиком
+        cells = [df.iloc[:, i].astype(str) for i in range(df.shape[1])]
+        lines.extend(cells[0].str.cat(cells[1:], sep=" | ").tolist())
+        return lines
+
+    @staticmethod
+    def _read_csv_table(data: Any, max_rows: int, max_columns: int) -> Tuple["pd.DataFrame", bool]:
+        frames, rows, columns_truncated = [], 0, False
+        reader = pd.read_csv(
+            data, keep_default_na=False, dtype=str, chunksize=settings.TABLE_CSV_CHUNK_ROWS, nrows=max_rows + 1
+        )
+        with reader:
+            for chunk in reader:
+                columns_truncated |= chunk.shape[1] > max_columns
+                frames.append(chunk.iloc[:, :max_columns])
+                rows += len(chunk)
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        return df.iloc[:max_rows], rows > max_rows or columns_truncated
+
+    @staticmethod
+    def _read_xlsx_tables(data: Any, max_rows: int, max_columns: int) -> Tuple[List[Tuple[str, "pd.DataFrame"]], bool]:
+        workbook = openpyxl.load_workbook(data, read_only=True, data_only=True)
+        sheets, truncated, budget = [], False, max_rows
+        try:
+            for sheet in workbook.worksheets:
+                if budget <= 0:
+                    truncated = True
+                    break
+                rows = sheet.iter_rows(values_only=True)
+                header = next(rows, None)
+                if header is None:
+                    continue
+                truncated |= len(header) > max_columns
+                header = ["" if value is None else str(value) for value in header[:max_columns]]
+                records = [row[:max_columns] for row in itertools.islice(rows, budget + 1)]
+                if len(records) > budget:
+                    truncated = True
+                    records = records[:budget]
+                budget -= len(records)
+                df = pd.DataFrame.from_records(records, columns=header) if records else pd.DataFrame(columns=header)
+                sheets.append((sheet.title, df.fillna("")))
+        finally:
+            workbook.close()
+        return sheets, truncated
+
+    async def read_csv_or_excel(self, source: Union[str, bytes], file_name: Optional[str] = None) -> dict:
+        error = self.check_source(source)
+        if error:
+            return error
+        suffix = Path(file_name or ("" if self.is_buffer(source) else source)).suffix.lower()
+        max_rows = settings.TABLE_MAX_ROWS
+        max_columns = settings.TABLE_MAX_COLUMNS
 
         def extract_table():
             try:
-                if path.suffix.lower() == '.csv':
-                    df = pd.read_csv(path, keep_default_na=False)
-                elif path.suffix.lower() in ['.xls', '.xlsx']:
-                    df = pd.read_excel(path, keep_default_na=False)
+                data = io.BytesIO(source) if self.is_buffer(source) else Path(source)
+                if suffix == '.csv':
+                    df, truncated = self._read_csv_table(data, max_rows, max_columns)
+                    sheets = [(None, df)]
+                elif suffix == '.xlsx':
+                    sheets, truncated = self._read_xlsx_tables(data, max_rows, max_columns)
+                elif suffix == '.xls':
+                    frames = pd.read_excel(data, sheet_name=None, keep_default_na=False, nrows=max_rows + 1)
+                    sheets, truncated, budget = [], False, max_rows
+                    for title, df in frames.items():
+                        truncated |= len(df) > budget or df.shape[1] > max_columns
+                        if budget > 0:
+                            sheets.append((title, df.iloc[:budget, :max_columns]))
+                        budget -= min(len(df), budget)
                 else:
                     raise ValueError("Unsupported format")
-                lines = [" | ".join(df.columns.astype(str))]
-                lines.append("-|-".join(["-" * len(col) for col in df.columns.astype(str)]))
-                for _, row in df.iterrows():
-                    lines.append(" | ".join(str(cell) for cell in row))
+
+                lines = []
+                for title, df in sheets:
+                    if len(sheets) > 1:
+                        lines.extend([""] if lines else [])
+                        lines.append(f"[{title}]")
+                    lines.extend(self.render_table(df))
                 text = "\n".join(lines)
-                metadata = {"row_count": len(df), "column_count": len(df.columns), "columns": list(df.columns)}
+                first = sheets[0][1] if sheets else pd.DataFrame()
+                metadata = {
+                    "row_count": sum(len(df) for _, df in sheets),
+                    "column_count": len(first.columns),
+                    "columns": list(first.columns),
+                    "sheets": [
+                        {"name": title, "row_count": len(df), "column_count": len(df.columns)}
+                        for title, df in sheets if title is not None
+                    ],
+                    "truncated": truncated,
+                }
                 return {"status": "success", "text": text, "metadata": metadata}
             except Exception as e:
                 raise Exception(f"Error: {str(e)}")
@@ -810,22 +2513,26 @@ class FileConvertToText:
             return {"status": "error", "text": str(e), "metadata": {}}
 
     # --- Text file ---
-    async def read_text_file(self, file_path: str) -> dict:
-        path = Path(file_path)
-        if not path.exists() or not path.is_file():
-            return {"status": "error", "text": "File does not exist", "metadata": {}}
+    async def read_text_file(self, source: Union[str, bytes]) -> dict:
+        error = self.check_source(source)
+        if error:
+            return error
+        if self.is_buffer(source):
+            data = source
+        else:
+            async with aiofiles.open(source, 'rb') as f:
+                data = await f.read()
         encodings = ['utf-8', 'cp1251', 'latin-1']
         for encoding in encodings:
             try:
-                async with aiofiles.open(file_path, 'r', encoding=encoding) as f:
-                    text = await f.read()
-                    text = text.replace('\r\n', '\n').replace('\r', '\n')
-                    metadata = {
-                        "line_count": text.count('\n') + 1,
-                        "word_count": len(re.findall(r'\b\w+\b', text)),
-                        "encoding_used": encoding
-                    }
-                    return {"status": "success", "text": text, "metadata": metadata}
+                text = bytes(data).decode(encoding)
+                text = text.replace('\r\n', '\n').replace('\r', '\n')
+                metadata = {
+                    "line_count": text.count('\n') + 1,
+                    "word_count": len(re.findall(r'\b\w+\b', text)),
+                    "encoding_used": encoding
+                }
+                return {"status": "success", "text": text, "metadata": metadata}
             except UnicodeDecodeError:
                 continue
             except Exception as e:
@@ -834,41 +2541,82 @@ class FileConvertToText:
         return {"status": "error", "text": "Failed to decode file", "metadata": {}}
 
     # --- Image OCR ---
-    async def read_image_to_text(self, file_path: str) -> dict:
-        path = Path(file_path)
-        if not path.exists():
-            return {"status": "error", "text": f"File not found: {file_path}", "metadata": {}}
-        if path.stat().st_size > self.MAX_SIZE_BYTES:
+    async def read_image_to_text(
+        self,
+        source: Union[str, bytes],
+        cancel_event: Optional[asyncio.Event] = None,
+        file_name: Optional[str] = None
+    ) -> dict:
+        in_memory = self.is_buffer(source)
+        path = Path(file_name or "image.png") if in_memory else Path(source)
+        if not in_memory and not path.exists():
+            return {"status": "error", "text": f"File not found: {source}", "metadata": {}}
+        if (len(source) if in_memory else path.stat().st_size) > self.MAX_SIZE_BYTES:
             return {"status": "error", "text": f"{path.name}: too large", "metadata": {}}
         if path.suffix.lower() not in self.SUPPORTED_IMAGE_EXTENSIONS:
             return {"status": "error", "text": f"Unsupported image type: {path.suffix}", "metadata": {}}
         if self.ocr_processor is None:
             return {"status": "error", "text": "OCR Processor not initialized", "metadata": {}}
 
+        data = bytes(source) if in_memory else None
+        cache_key = None
+        if self.ocr_cache is not None:
+            if data is None:
+                async with aiofiles.open(path, 'rb') as f:
+                    data = await f.read()
+            cache_key = await asyncio.to_thread(
+                self.ocr_cache.make_key, data, self.ocr_processor.worker_config_key
+            )
+            cached = await asyncio.to_thread(self.ocr_cache.get, cache_key)
+            if cached is not None:
+                return {"status": "success", "text": cached.get('text', ''), "metadata": {"cache_hit": True}}
+
         print(f"Starting OCR for: {path.name}")
-        result = await self.ocr_processor.perform_ocr_async(str(path))
+        if data is not None:
+            # Байты уже в памяти — воркер декодирует их сам, без повторного чтения файла
+            result = await self.ocr_processor.perform_ocr_bytes_async(data, path.name, cancel_event=cancel_event)
+        else:
+            result = await self.ocr_processor.perform_ocr_async(str(path), cancel_event=cancel_event)
+        if isinstance(result, dict) and result.get('status') == 'cancelled':
+            return {"status": "cancelled", "text": "Cancelled", "metadata": {}}
         if isinstance(result, dict) and result.get('status') == 'success':
+            if cache_key is not None:
+                await asyncio.to_thread(self.ocr_cache.set, cache_key, result)
             return {"status": "success", "text": result.get('text', ''), "metadata": result.get('metadata', {})}
         if isinstance(result, str):
             return {"status": "success", "text": result, "metadata": {"source": "ocr_string"}}
         return {"status": "error", "text": "OCR failed", "metadata": {}}
 
     # --- Convert any file ---
-    async def convert_to_text(self, file_path: str) -> dict:
-        file_info = await self.get_file_format(file_path)
+    async def convert_to_text(
+        self,
+        source: Union[str, bytes, bytearray, memoryview, io.IOBase],
+        cancel_event: Optional[asyncio.Event] = None,
+        file_name: Optional[str] = None
+    ) -> dict:
+        # Загрузки из Telegram приходят байтами: file_name нужен только ради расширения
+        if self.is_buffer(source) or isinstance(source, io.IOBase):
+            source = self.as_bytes(source)
+            file_name = file_name or "upload"
+            file_info = self.get_buffer_format(source, file_name)
+        else:
+            file_info = await self.get_file_format(source)
         if file_info.get("status") == "error":
             return {"status": "error", "text": file_info["error"], "metadata": {}}
         ext = file_info.get("extension", "").lower()
         if ext in self.SUPPORTED_FORMATS['word']:
-            return await self.read_word(file_path)
+            if await self.needs_office_sandbox(source, ext):
+                data = source if self.is_buffer(source) else await asyncio.to_thread(Path(source).read_bytes)
+                return await run_office_sandbox(data, cancel_event)
+            return await self.read_word(source)
         elif ext in self.SUPPORTED_FORMATS['pdf']:
-            return await self.pdf_to_text_async(file_path)
+            return await self.pdf_to_text_async(source, cancel_event, file_name)
         elif ext in self.SUPPORTED_FORMATS['spreadsheet']:
-            return await self.read_csv_or_excel(file_path)
+            return await self.read_csv_or_excel(source, file_name)
         elif ext in self.SUPPORTED_FORMATS['text']:
-            return await self.read_text_file(file_path)
+            return await self.read_text_file(source)
         elif ext in self.SUPPORTED_FORMATS['image']:
-            return await self.read_image_to_text(file_path)
+            return await self.read_image_to_text(source, cancel_event, file_name)
         else:
             return {"status": "error", "text": f"Unsupported format: {ext}", "metadata": {}}
 
@@ -0,0 +1,65 @@
+import io
+import json
+import os
+import sys
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# Запускается отдельным процессом: python -m functions.office_worker <memory_mb> <cpu_seconds>
+# Документ приходит в stdin, результат уходит одной JSON-строкой в stdout
+
+
+def apply_limits(memory_mb: int, cpu_seconds: int) -> None:
+    if memory_mb > 0:
+        # RLIMIT_AS не подходит: .NET-рантайм aspose резервирует адресное пространство с запасом и не стартует.
+        # Ограничивается куча GC (aspose идёт с netcore3.1 — префикс COMPlus_); задаётся до импорта aspose.words
+        limit = f"0x{memory_mb * 1024 * 1024:X}"
+        os.environ["COMPlus_GCHeapHardLimit"] = limit
+        os.environ["DOTNET_GCHeapHardLimit"] = limit
+    if resource is not None and cpu_seconds > 0:
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+
+
+def convert(data: bytes) -> dict:
+    import aspose.words as aw
+
+    doc = aw.Document(io.BytesIO(data))
+    text = doc.to_string(aw.SaveFormat.TEXT)
+    # Без лицензии Aspose добавляет строки о пробной версии
+    lines = [line.rstrip() for line in text.replace('\r\n', '\n').replace('\r', '\n').split('\n')]
+    lines = [line for line in lines if line.strip() and "Aspose" not in line]
+    text = "\n".join(lines)
+    metadata = {
+        "paragraph_count": doc.get_child_nodes(aw.NodeType.PARAGRAPH, True).count,
+        "table_count": doc.get_child_nodes(aw.NodeType.TABLE, True).count,
+        "word_count": len(text.split()),
+        "source": "aspose-sandbox"
+    }
+    return {"status": "success", "text": text, "metadata": metadata}
+
+
+def main() -> int:
+    memory_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    cpu_seconds = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    data = sys.stdin.buffer.read()
+    try:
+        apply_limits(memory_mb, cpu_seconds)
+        result = convert(data)
+    except MemoryError:
+        result = {"status": "error", "text": "Office conversion exceeded the memory limit", "metadata": {}}
+    except Exception as e:
+        if "OutOfMemoryException" in str(e):
+            result = {"status": "error", "text": "Office conversion exceeded the memory limit", "metadata": {}}
+        else:
+            result = {"status": "error", "text": f"Office conversion failed: {e}", "metadata": {}}
+    sys.stdout.write(json.dumps(result, ensure_ascii=False))
+    sys.stdout.flush()
+    return 0 if result["status"] == "success" else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Set, Tuple
+
+from config.settings import settings
+from functions.file_processing import FileConvertToText, ProfessionalOCRProcessor, get_ocr_pool
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_processed(output: Path, retry_errors: bool) -> Set[str]:
+    processed = set()
+    if not output.exists():
+        return processed
+    with open(output, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Строка, оборванная прерыванием, — файл будет обработан заново
+                continue
+            if retry_errors and record.get('status') != 'success':
+                continue
+            processed.add(record.get('sha256'))
+    return processed
+
+
+def collect_files(root: Path, recursive: bool) -> List[Path]:
+    extensions = set(FileConvertToText.SUPPORTED_IMAGE_EXTENSIONS)
+    paths = root.rglob('*') if recursive else root.glob('*')
+    return sorted(p for p in paths if p.is_file() and p.suffix.lower() in extensions)
+
+
+def plan(files: List[Path], processed: Set[str], workers: int) -> Tuple[List[str], Dict[str, str], int, int]:
+    with ThreadPoolExecutor(max_workers=min(8, workers * 2)) as executor:
+        hashes = list(executor.map(file_sha256, files))
+
+    pending, hash_by_path = [], {}
+    skipped = duplicates = 0
+    seen = set(processed)
+    for path, sha in zip(files, hashes):
+        if sha in processed:
+            skipped += 1
+            continue
+        if sha in seen:
+            duplicates += 1
+            continue
+        seen.add(sha)
+        pending.append(str(path))
+        hash_by_path[str(path)] = sha
+    return pending, hash_by_path, skipped, duplicates
+
+
+def to_record(root: Path, item: Dict[str, Any], sha: str) -> Dict[str, Any]:
+    result = item['result'] if isinstance(item.get('result'), dict) else {}
+    return {
+        'sha256': sha,
+        'path': os.path.relpath(item['file_path'], root),
+        'status': result.get('status', 'error'),
+        'text': result.get('text', ''),
+        'confidence': result.get('confidence', 0.0),
+        'quality': (result.get('quality_scores') or {}).get('overall', 0.0),
+        'preprocessing_method': result.get('preprocessing_method'),
+        'image_variant': result.get('image_variant'),
+        'word_count': result.get('word_count', 0),
+        'rotation': result.get('rotation'),
+        'skew_angle': result.get('skew_angle'),
+        'processed_at': datetime.now().isoformat(),
+    }
+
+
+def _json_default(value: Any) -> Any:
+    return value.item() if hasattr(value, 'item') else str(value)
+
+
+async def run(args: argparse.Namespace) -> int:
+    root = Path(args.input).resolve()
+    output = Path(args.output)
+    if not root.is_dir():
+        print(f"Not a directory: {root}", file=sys.stderr)
+        return 2
+
+    # Пул процессов создаётся с этими значениями при первой задаче; воркеры читают окружение при запуске,
+    # а ядра уже поделены между файлами, поэтому тайлы внутри одного файла не распараллеливаем
+    os.environ.setdefault("OCR_TILE_WORKERS", "1")
+    settings.OCR_WORKERS = args.workers
+    settings.OCR_MAX_INFLIGHT = args.workers
+    settings.OCR_MAX_QUEUE = args.workers * 2
+
+    processed = load_processed(output, args.retry_errors)
+    files = collect_files(root, not args.no_recursive)
+    pending, hash_by_path, skipped, duplicates = await asyncio.to_thread(plan, files, processed, args.workers)
+    print(
+        f"{len(files)} images, {skipped} already in {output.name}, {duplicates} duplicates, {len(pending)} to OCR",
+        file=sys.stderr
+    )
+    if not pending:
+        return 0
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    if output.exists() and output.stat().st_size:
+        with open(output, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            broken_tail = f.read(1) != b'\n'
+    else:
+        broken_tail = False
+
+    processor = ProfessionalOCRProcessor(languages=args.languages.split('+'), min_confidence=args.min_confidence)
+    failed = 0
+
+    def progress(done: int, total: int, item: Dict[str, Any]) -> None:
+        status = item['result'].get('status', 'error') if isinstance(item.get('result'), dict) else 'error'
+        print(f"[{done}/{total}] {status:9} {os.path.relpath(item['file_path'], root)}", file=sys.stderr)
+
+    try:
+        with open(output, 'a', encoding='utf-8') as out:
+            if broken_tail:
+                out.write('\n')
+            async for item in processor.iter_batch_async(pending, max_concurrent=args.workers, progress=progress):
+                record = to_record(root, item, hash_by_path[item['file_path']])
+                failed += record['status'] != 'success'
+                out.write(json.dumps(record, ensure_ascii=False, default=_json_default) + '\n')
+                out.flush()
+    finally:
+        get_ocr_pool(processor.worker_config).shutdown(wait=False)
+
+    print(f"done: {len(pending) - failed} ok, {failed} failed", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="OCR a directory of images into a resumable JSONL file")
+    parser.add_argument("input", help="directory with images")
+    parser.add_argument("-o", "--output", default="ocr_corpus.jsonl")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--languages", default="eng+rus")
+    parser.add_argument("--min-confidence", type=float, default=0.5)
+    parser.add_argument("--no-recursive", action="store_true")
+    parser.add_argument("--retry-errors", action="store_true", help="OCR again files recorded with an error")
+    args = parser.parse_args()
+    args.workers = max(1, args.workers)
+
+    try:
+        return asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print("interrupted, rerun the same command to resume", file=sys.stderr)
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
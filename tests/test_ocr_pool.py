@@ -0,0 +1,51 @@
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import asyncio
+import shutil
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+pytest.importorskip("pytesseract")
+
+from functions.file_processing import OCRQueueFullError, OCRWorkerPool, ProfessionalOCRProcessor, _run_ocr_image_job
+
+
+@pytest.mark.skipif(shutil.which("tesseract") is None, reason="tesseract binary is not installed")
+def test_pool_runs_ocr_job():
+    # Воркер создаёт ProfessionalOCRProcessor(**worker_config): любой лишний ключ роняет весь пул
+    config = ProfessionalOCRProcessor().worker_config
+    pool = OCRWorkerPool(config, max_workers=1)
+    image = np.full((120, 400), 255, dtype=np.uint8)
+
+    async def run():
+        return await pool.submit(_run_ocr_image_job, image, "blank.png", timeout=120)
+
+    try:
+        result = asyncio.run(run())
+    finally:
+        pool.shutdown(wait=True)
+
+    assert isinstance(result, dict)
+    assert result.get('status') in ('success', 'error')
+    assert pool.stats()['completed'] == 1
+
+
+def test_pool_rejects_burst_over_queue():
+    # Задачи, пришедшие в одном тике, тоже упираются в OCR_MAX_QUEUE
+    pool = OCRWorkerPool(ProfessionalOCRProcessor().worker_config, max_workers=1, max_inflight=1, max_queue=1)
+
+    async def run():
+        jobs = [pool.submit(time.sleep, 0.2, timeout=60) for _ in range(6)]
+        return await asyncio.gather(*jobs, return_exceptions=True)
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        pool.shutdown(wait=True)
+
+    rejected = [r for r in results if isinstance(r, OCRQueueFullError)]
+    assert len(rejected) == 4
+    assert pool.stats()['completed'] == 2
@@ -0,0 +1,26 @@
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+from functions.file_processing import ProfessionalOCRProcessor
+
+
+@pytest.fixture(scope="module")
+def processor():
+    return ProfessionalOCRProcessor()
+
+
+def test_blank_image_is_not_deskewed(processor):
+    assert processor.estimate_skew(np.full((120, 400), 255, dtype=np.uint8)) == 0.0
+
+
+def test_skew_is_found_within_limit(processor):
+    image = np.full((600, 900), 255, dtype=np.uint8)
+    for y in range(60, 560, 40):
+        cv2.putText(image, "The quick brown fox jumps over", (40, y), cv2.FONT_HERSHEY_SIMPLEX, 0.9, 0, 2)
+    angle = processor.estimate_skew(ProfessionalOCRProcessor.rotate_bound(image, 4.0))
+    assert abs(angle + 4.0) <= 0.5
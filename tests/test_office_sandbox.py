@@ -0,0 +1,43 @@
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import asyncio
+import subprocess
+
+import pytest
+
+pytest.importorskip("aspose.words")
+
+from config.settings import settings
+from functions.file_processing import run_office_sandbox
+
+
+# .doc собирается самим aspose в отдельном процессе: .NET-рантайм не поднимается в процессе тестов
+MAKE_DOC = """
+import io, sys
+import aspose.words as aw
+doc = aw.Document()
+builder = aw.DocumentBuilder(doc)
+builder.writeln("Employer: ACME Recruitment Ltd")
+builder.writeln("Company No 01234567")
+out = io.BytesIO()
+doc.save(out, aw.SaveFormat.DOC)
+sys.stdout.buffer.write(out.getvalue())
+"""
+
+
+@pytest.fixture(scope="module")
+def sample_doc() -> bytes:
+    result = subprocess.run([sys.executable, "-c", MAKE_DOC], capture_output=True, timeout=300)
+    if result.returncode != 0 or not result.stdout:
+        pytest.skip(f"aspose-words cannot start here: {result.stderr.decode('utf-8', 'replace')[-300:]}")
+    return result.stdout
+
+
+def test_doc_converts_at_default_limits(sample_doc):
+    # Лимиты по умолчанию должны пропускать обычный документ, а не ронять .NET-рантайм при старте
+    assert settings.OFFICE_SANDBOX_MEMORY_MB > 0
+    result = asyncio.run(run_office_sandbox(sample_doc))
+    assert result['status'] == 'success', result['text']
+    assert "ACME Recruitment Ltd" in result['text']
+    assert "01234567" in result['text']
+    assert result['metadata']['source'] == 'aspose-sandbox'